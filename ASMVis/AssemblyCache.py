@@ -0,0 +1,82 @@
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+import Grammar as grm
+
+"""
+AssemblyCache stores assembled programs keyed by a hash of the file content and the grammar version
+Entries hold the syntax message, token sets, type lists, label_map and skeletons of a file,
+so repeat loads of an unchanged file skip tokenizing, parsing and encoding
+Entries live in an in-memory LRU and, when a directory is given, in pickle files on disk
+Only point directory at a location you trust, since entries are unpickled when read
+"""
+
+default_capacity: int = 256
+chunk_size: int = 1 << 16
+
+
+class AssemblyCache:
+
+    def __init__(self, capacity: int = default_capacity, directory: str = None):
+        """The AssemblyCache Constructor initializes the below variables:
+            - capacity: maximum number of entries kept in memory
+            - directory: optional on-disk cache directory, created on first store
+            - entries: in-memory LRU of key -> entry, least recently used first
+            - hits, misses: look-up counters
+        """
+        self.capacity = capacity
+        self.directory = directory
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, file_nm: str) -> str:
+        """Hashes the grammar version and the file content, reading the file in chunks"""
+        digest = hashlib.sha256(grm.grammar_version.encode())
+        with open(file_nm, 'rb') as file:
+            chunk = file.read(chunk_size)
+            while chunk:
+                digest.update(chunk)
+                chunk = file.read(chunk_size)
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".pickle")
+
+    def get(self, key: str) -> tuple:
+        """Returns the entry for key, or None when it is cached neither in memory nor on disk"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        if self.directory is not None:
+            try:
+                with open(self.path(key), 'rb') as file:
+                    entry = pickle.load(file)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                entry = None
+            if entry is not None:
+                self.remember(key, entry)
+                self.hits += 1
+                return entry
+        self.misses += 1
+        return None
+
+    def remember(self, key: str, entry: tuple):
+        """Adds an entry to the in-memory LRU, evicting the least recently used entry when full"""
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def put(self, key: str, entry: tuple):
+        """Stores an entry (message, token sets, type lists, label_map, skeletons) in memory and on disk"""
+        self.remember(key, entry)
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            temp = f"{self.path(key)}.{os.getpid()}.tmp"
+            with open(temp, 'wb') as file:
+                pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, self.path(key))
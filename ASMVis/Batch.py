@@ -0,0 +1,147 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+from AssemblyCache import AssemblyCache
+from Cache import CacheHierarchy
+from CostModel import CostModel
+from Profile import Profile
+from Simulation import Simulation, default_max_steps, runtime_message
+import Trace as trc
+import Visualizer as v
+
+"""
+Batch grading entry point
+Assembles and simulates every MiniASM file in a directory in parallel, printing one JSON line per file
+Usage (from the ASMVis directory): python -m Batch <dir> [--pattern *.asm] [--workers N] [--max-steps N] [--cache-dir DIR] [--trace-dir DIR] [--profile] [--cost [FILE]] [--cache [FILE]]
+"""
+
+
+def trace_path(trace_dir: str, path: str) -> str:
+    """Returns the trace file for a program, named after it and a digest of its full path so same-named files never collide"""
+    digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:8]
+    return os.path.join(trace_dir, f"{os.path.splitext(os.path.basename(path))[0]}-{digest}.trace")
+
+
+def read_settings(path: str) -> dict:
+    """Returns the JSON object held by the settings file path, {} (every default) when path is ""
+    raises Exception naming path when the file cannot be read or does not hold a JSON object
+    """
+    if path == "":
+        return {}
+    try:
+        with open(path, 'r') as file:
+            settings = json.load(file)
+    except (OSError, ValueError) as e:
+        raise Exception(f"Error:\n\"{path}\" -> {e}") from None
+    if not isinstance(settings, dict):
+        raise Exception(f"Error:\n\"{path}\" -> expected a JSON object")
+    return settings
+
+
+def grade_file(path: str, max_steps: int = default_max_steps, cache_dir: str = None, trace_dir: str = None, profile: bool = False,
+               cost: dict = None, caches: dict = None) -> dict:
+    """Runs the syntax check and a full simulation for a single file
+    Assemblies are reused from cache_dir when given, so re-runs skip parsing unchanged files
+    With trace_dir, the run's binary trace is written there and its path reported as "trace"
+    With profile, the run is profiled and its hot lines, branches and addresses reported as "profile"
+    With cost, the run's cycles and bus words are reported as "cost", charged by a CostModel built from the cost settings
+    With caches, memory and disk accesses run through simulated caches whose hit and miss counts are reported as "caches",
+    configured by the caches settings
+    Settings are dicts as returned by read_settings, {} keeping every default
+    Files that do not assemble also report every syntax error, found in one more pass, as "diagnostics"
+    Returns a JSON-serializable report; runtime errors are reported rather than raised
+    """
+    emul = Simulation(numeric=True)
+    report = {"file": path, "syntax": "", "ok": False, "halted": False, "steps": 0}
+    cache = AssemblyCache(directory=cache_dir) if cache_dir is not None else None
+    assembler = v.Assembler(path, cache)
+    try:
+        message, lines = assembler.start(emul)
+    except Exception as e:
+        message, lines = e, []
+    report["syntax"] = str(message)
+    if len(lines) == 0:
+        # valid files, the common case, are parsed once; only failing ones are re-read for every error
+        try:
+            report["diagnostics"] = [error.diagnostic() for error in assembler.diagnostics()]
+        except Exception:
+            pass
+        return report
+    report["ok"] = True
+    counters = Profile().attach(emul) if profile else None
+    model = None
+    if cost is not None:
+        model = CostModel.from_settings(cost).attach(emul)
+    hierarchy = None
+    if caches is not None:
+        hierarchy = CacheHierarchy.from_settings(caches).attach(emul)
+    try:
+        if trace_dir is not None:
+            report["trace"] = trace_path(trace_dir, path)
+            report["steps"], report["seconds"] = trc.record_run(emul, report["trace"], max_steps=max_steps)
+        else:
+            report["steps"], report["seconds"] = emul.run(max_steps=max_steps)
+    except Exception as e:
+        report["error"] = runtime_message(e, emul.curr_line)
+    report["halted"] = emul.halted
+    if counters is not None:
+        report["profile"] = counters.summary(lines)
+    if model is not None:
+        report["cost"] = model.totals()
+    if hierarchy is not None:
+        report["caches"] = hierarchy.stats()
+    for location in ("registers", "memory", "disk"):
+        report[location] = emul.display_state(location)
+    return report
+
+
+def find_programs(directory: str, pattern: str) -> list[str]:
+    """Returns the sorted paths under directory matching pattern"""
+    return sorted(glob(os.path.join(directory, "**", pattern), recursive=True))
+
+
+def main(argv: list[str] = None) -> int:
+    arg_parser = argparse.ArgumentParser(prog="python -m Batch", description="Assemble and simulate a directory of MiniASM programs")
+    arg_parser.add_argument("directory")
+    arg_parser.add_argument("--pattern", default="*.asm", help="glob pattern for program files (default: *.asm)")
+    arg_parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    arg_parser.add_argument("--max-steps", type=int, default=default_max_steps, help="step budget per program")
+    arg_parser.add_argument("--cache-dir", default=None, help="directory for cached assemblies, reused across runs")
+    arg_parser.add_argument("--trace-dir", default=None, help="directory to write a binary execution trace per program")
+    arg_parser.add_argument("--profile", action="store_true", help="report each program's hot lines, branch outcomes and most accessed addresses")
+    arg_parser.add_argument("--cost", nargs="?", const="", default=None, metavar="FILE",
+                            help="report each run's cycles and bus traffic, using the cost model settings in FILE when given")
+    arg_parser.add_argument("--cache", nargs="?", const="", default=None, metavar="FILE",
+                            help="simulate memory and disk caches and report their hits and misses, configured by FILE when given")
+    args = arg_parser.parse_args(argv)
+    # settings are read and checked once here, and workers receive the loaded dicts
+    cost, caches = None, None
+    try:
+        if args.cost is not None:
+            cost = read_settings(args.cost)
+            CostModel.from_settings(cost)
+        if args.cache is not None:
+            caches = read_settings(args.cache)
+            CacheHierarchy.from_settings(caches)
+    except Exception as e:
+        print(e, file=sys.stderr)
+        return 1
+    if args.trace_dir is not None:
+        os.makedirs(args.trace_dir, exist_ok=True)
+    paths = find_programs(args.directory, args.pattern)
+    workers = args.workers or os.cpu_count() or 1
+    chunksize = max(1, len(paths) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for report in executor.map(grade_file, paths, [args.max_steps] * len(paths), [args.cache_dir] * len(paths),
+                                   [args.trace_dir] * len(paths), [args.profile] * len(paths),
+                                   [cost] * len(paths), [caches] * len(paths), chunksize=chunksize):
+            print(json.dumps(report), flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+import re
+import Grammar as grm
+import Instructions as ins
+from Simulation import comparisons
+
+"""
+Line and conditional breakpoints for compiled MiniASM runs
+Breakpoints is a Simulation observer: Simulation.run stops after a step that hits one, and the step
+visualizer checks hit after each step it runs without drawing
+Breakpoint specs:
+    - 12 or line 12: the operation on line 12 (non-empty lines counted from 1) executes
+    - r1 > 40, memory[x+20] <= r2, ...: the comparison becomes true (operands are registers,
+      memory[address], disk[address] or numbers; operators are those of the conditional branches)
+    - memory[x+20] changes, r3 changes: a step writes a different value there
+"""
+
+operators = {grm.branches[name]: compare for name, compare in comparisons.items()}
+operand_pattern = "r\\d+|(?:memory|disk)\\s*\\[[^\\]]*\\]|-?\\d+"
+line_pattern = re.compile("(?:line\\s+)?(\\d+)")
+compare_pattern = re.compile(f"({operand_pattern})\\s*(<=|>=|==|!=|<|>)\\s*({operand_pattern})")
+change_pattern = re.compile(f"({operand_pattern})\\s+changes")
+location_pattern = re.compile("(memory|disk)\\s*\\[\\s*([^\\]\\s]+)\\s*\\]")
+
+
+def parse_operand(text: str, spec: str):
+    """Converts an operand to a (location, address) key, or an int for number literals
+    raises Exception for registers past r16 and malformed addresses
+    """
+    if text[0] == "r":
+        number = int(text[1:])
+        if number >= ins.register_count:
+            raise Exception(f"Error:\nBreakpoint \"{spec}\" -> there is no register {text}")
+        return ("registers", number)
+    match = location_pattern.fullmatch(text)
+    if match is not None:
+        try:
+            return (match.group(1), ins.address_key(match.group(2)))
+        except ValueError:
+            raise Exception(f"Error:\nBreakpoint \"{spec}\" -> \"{match.group(2)}\" is not an address")
+    return int(text)
+
+
+class Condition:
+
+    def __init__(self, spec: str, left, operator: str, right):
+        """The Condition Constructor initializes the below variables:
+            - spec: breakpoint text as entered
+            - left, right: operands, (location, address) keys or int literals; right is None for a changes condition
+            - operator: comparison symbol, or "changes"
+            - last: value of the condition (or watched value for changes) after the latest step it saw
+        """
+        self.spec = spec
+        self.left = left
+        self.operator = operator
+        self.right = right
+        self.last = None
+
+    def keys(self) -> list[tuple[str, int]]:
+        """The machine locations the condition depends on"""
+        return [operand for operand in (self.left, self.right) if isinstance(operand, tuple)]
+
+    def value(self, sim, operand) -> int:
+        if not isinstance(operand, tuple):
+            return operand
+        location, address = operand
+        if location == "registers":
+            return sim.registers[address]
+        return getattr(sim, location).get(address, 0 if self.operator != "changes" else None)
+
+    def current(self, sim):
+        """The condition's truth value, or the watched value for a changes condition"""
+        if self.operator == "changes":
+            return self.value(sim, self.left)
+        return operators[self.operator](self.value(sim, self.left), self.value(sim, self.right))
+
+    def arm(self, sim):
+        """Records the current state so only later changes can hit"""
+        self.last = self.current(sim)
+
+    def update(self, sim) -> bool:
+        """Re-evaluates after a step wrote one of the condition's keys, returning whether the breakpoint hits"""
+        previous, self.last = self.last, self.current(sim)
+        if self.operator == "changes":
+            return self.last != previous
+        return self.last and not previous
+
+
+class Breakpoints:
+
+    def __init__(self):
+        """The Breakpoints Constructor initializes the below variables:
+            - lines: operation indexes with a line breakpoint
+            - conditions: spec -> Condition of every conditional breakpoint
+            - watched: (location, address) -> conditions depending on it, so a step only re-evaluates what it wrote
+            - hit: spec of the breakpoint the latest step hit, None when none did
+        """
+        self.lines: set[int] = set()
+        self.conditions: dict[str, Condition] = {}
+        self.watched: dict[tuple[str, int], list[Condition]] = {}
+        self.hit: str = None
+
+    def add(self, spec: str, sim=None) -> str:
+        """Adds the breakpoint described by spec, arming conditions against sim's state when given
+        raises Exception when spec is not a breakpoint
+        Returns the normalized spec used to list and remove the breakpoint
+        """
+        text = " ".join(spec.lower().split())
+        match = line_pattern.fullmatch(text)
+        if match is not None:
+            line = int(match.group(1))
+            if line < 1:
+                raise Exception(f"Error:\nBreakpoint \"{spec}\" -> lines are counted from 1")
+            self.lines.add(line - 1)
+            return f"line {line}"
+        match = compare_pattern.fullmatch(text)
+        if match is not None:
+            condition = Condition(text, parse_operand(match.group(1), spec), match.group(2), parse_operand(match.group(3), spec))
+        else:
+            match = change_pattern.fullmatch(text)
+            if match is None:
+                raise Exception(f"Error:\nBreakpoint \"{spec}\" -> expected a line number, a comparison such as \"r1 > 40\" or \"memory[x+20] changes\"")
+            condition = Condition(text, parse_operand(match.group(1), spec), "changes", None)
+        if len(condition.keys()) == 0:
+            raise Exception(f"Error:\nBreakpoint \"{spec}\" -> the condition does not depend on any register, memory or disk value")
+        self.remove(text)
+        self.conditions[text] = condition
+        for key in set(condition.keys()):
+            self.watched.setdefault(key, []).append(condition)
+        if sim is not None:
+            condition.arm(sim)
+        return text
+
+    def remove(self, spec: str):
+        """Removes the breakpoint listed as spec, if any"""
+        match = line_pattern.fullmatch(spec)
+        if match is not None:
+            self.lines.discard(int(match.group(1)) - 1)
+            return
+        condition = self.conditions.pop(spec, None)
+        if condition is None:
+            return
+        for key in set(condition.keys()):
+            self.watched[key].remove(condition)
+            if len(self.watched[key]) == 0:
+                del self.watched[key]
+
+    def specs(self) -> list[str]:
+        """Every breakpoint, line breakpoints first"""
+        return [f"line {index + 1}" for index in sorted(self.lines)] + list(self.conditions)
+
+    def arm(self, sim):
+        """Clears hit and bases every condition on sim's current state, to be called before running to a breakpoint"""
+        self.hit = None
+        for condition in self.conditions.values():
+            condition.arm(sim)
+
+    def __call__(self, sim, index: int, op: ins.Instruction, target: tuple[str, int], next_index: int) -> bool:
+        """Observer hook checking the step that just executed op at index; returns True to stop a run when one hits"""
+        hit: str = None
+        if index in self.lines:
+            hit = f"line {index + 1}"
+        conditions = self.watched.get(target) if target is not None else None
+        if conditions is not None:
+            for condition in conditions:
+                if condition.update(sim) and hit is None:
+                    hit = condition.spec
+        if hit is not None:
+            self.hit = hit
+            return True
+        return False
@@ -0,0 +1,186 @@
+import json
+from collections import OrderedDict
+import Instructions as ins
+
+"""
+Simulated caches between the registers and memory, and between memory and disk (a page cache)
+A Cache is set-associative: an address maps to block address // block_size, which lives in set block % sets
+Eviction policies:
+    - lru: evicts the least recently used block of the set
+    - fifo: evicts the block that entered the set first
+    - clock: second chance, a hand sweeps the set clearing reference bits and evicts the first unreferenced block
+Every operation on a set is O(1), associativity bounding the clock sweep
+CacheHierarchy is a Simulation probe running every memory and disk access of a step through its caches
+Simulations without the probe attached never touch a cache
+"""
+
+policies: tuple[str, ...] = ("lru", "fifo", "clock")
+default_settings: dict[str, dict] = {
+    "memory": {"size": 32, "associativity": 4, "block_size": 16, "policy": "lru"},
+    "disk": {"size": 8, "associativity": 8, "block_size": 64, "policy": "clock"}
+}
+indirect_opcode: int = ins.opcodes["load_indirect"]
+
+
+class ClockSet:
+    """Blocks of one set under clock eviction
+        - slots: block held by each way, None while the way is free
+        - referenced: reference bit of each way, set on every hit
+        - where: block -> way holding it
+        - hand: next way the clock inspects
+    """
+    __slots__ = ("slots", "referenced", "where", "hand")
+
+    def __init__(self, ways: int):
+        self.slots: list[int] = [None] * ways
+        self.referenced = bytearray(ways)
+        self.where: dict[int, int] = {}
+        self.hand = 0
+
+
+class Cache:
+
+    def __init__(self, size: int, associativity: int, block_size: int, policy: str = "lru"):
+        """The Cache Constructor initializes the below variables:
+            - size: number of blocks the cache holds
+            - associativity: blocks per set (size for a fully associative cache, 1 for a direct-mapped one)
+            - block_size: addresses per block
+            - policy: eviction policy, one of policies
+            - sets: per set an OrderedDict of blocks in eviction order (lru, fifo) or a ClockSet
+            - hits, misses, evictions: counters over every access so far
+        raises Exception when the geometry or policy is invalid
+        """
+        if policy not in policies:
+            raise Exception(f"Error:\nCache -> unknown policy \"{policy}\", expected one of {', '.join(policies)}")
+        if size < 1 or associativity < 1 or block_size < 1 or size % associativity != 0:
+            raise Exception(f"Error:\nCache -> size {size} must be a positive multiple of associativity {associativity}, and block_size positive")
+        self.size = size
+        self.associativity = associativity
+        self.block_size = block_size
+        self.policy = policy
+        set_count = size // associativity
+        if policy == "clock":
+            self.sets = [ClockSet(associativity) for i in range(set_count)]
+        else:
+            self.sets = [OrderedDict() for i in range(set_count)]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def access(self, address: int) -> bool:
+        """Looks up the block holding address, loading it on a miss; returns whether it hit"""
+        block = address // self.block_size
+        ways = self.sets[block % len(self.sets)]
+        if self.policy == "clock":
+            way = ways.where.get(block)
+            if way is not None:
+                ways.referenced[way] = 1
+                self.hits += 1
+                return True
+            slots, referenced = ways.slots, ways.referenced
+            while slots[ways.hand] is not None and referenced[ways.hand]:
+                referenced[ways.hand] = 0
+                ways.hand = (ways.hand + 1) % self.associativity
+            way = ways.hand
+            if slots[way] is not None:
+                del ways.where[slots[way]]
+                self.evictions += 1
+            slots[way] = block
+            referenced[way] = 1
+            ways.where[block] = way
+            ways.hand = (way + 1) % self.associativity
+            self.misses += 1
+            return False
+        if block in ways:
+            if self.policy == "lru":
+                ways.move_to_end(block)
+            self.hits += 1
+            return True
+        if len(ways) == self.associativity:
+            ways.popitem(last=False)
+            self.evictions += 1
+        ways[block] = None
+        self.misses += 1
+        return False
+
+    def stats(self) -> dict:
+        """JSON-serializable geometry and counters"""
+        accesses = self.hits + self.misses
+        return {"size": self.size, "associativity": self.associativity, "block_size": self.block_size, "policy": self.policy,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": round(self.hits / accesses, 4) if accesses > 0 else 0.0}
+
+
+class CacheHierarchy:
+
+    def __init__(self, memory: Cache = None, disk: Cache = None, keep_log: bool = False):
+        """The CacheHierarchy Constructor initializes the below variables:
+            - caches: "memory" and "disk" -> Cache, None for a location accessed uncached
+            - last: (location, address, hit) of every access of the latest step
+            - log: per step, the step's last (None for steps without accesses), kept only when keep_log is set
+        """
+        self.caches: dict[str, Cache] = {"memory": memory, "disk": disk}
+        self.last: list[tuple[str, int, bool]] = []
+        self.log: list = [] if keep_log else None
+
+    @classmethod
+    def from_settings(cls, settings: dict = None, keep_log: bool = False) -> "CacheHierarchy":
+        """Builds a hierarchy from {"memory": {...}, "disk": {...}} Cache arguments, default_settings when None
+        A location set to null is left uncached, and missing arguments keep their default
+        raises Exception when the settings are not Cache arguments
+        """
+        if settings is None:
+            settings = default_settings
+        caches: dict[str, Cache] = {}
+        for location in ("memory", "disk"):
+            arguments = settings.get(location, {})
+            if arguments is None:
+                caches[location] = None
+                continue
+            try:
+                caches[location] = Cache(**{**default_settings[location], **arguments})
+            except TypeError:
+                raise Exception(f"Error:\nCache -> {location} settings take size, associativity, block_size and policy")
+        return cls(caches["memory"], caches["disk"], keep_log)
+
+    @classmethod
+    def load(cls, path: str, keep_log: bool = False) -> "CacheHierarchy":
+        """Builds a hierarchy from a JSON settings file, see from_settings"""
+        with open(path, 'r') as file:
+            return cls.from_settings(json.load(file), keep_log)
+
+    def attach(self, sim) -> "CacheHierarchy":
+        """Registers the hierarchy as a probe of sim and returns it"""
+        sim.probes.append(self)
+        return self
+
+    def detach(self, sim):
+        if self in sim.probes:
+            sim.probes.remove(self)
+
+    def __call__(self, sim, index: int, op: ins.Instruction):
+        """Probe hook running the accesses of the step about to execute op through the caches"""
+        opcode = op.opcode
+        if opcode not in ins.address_forms:
+            self.last = []
+        else:
+            cache = self.caches[op.location]
+            last: list[tuple[str, int, bool]] = []
+            if opcode == indirect_opcode and cache is not None:
+                last.append((op.location, op.value, cache.access(op.value)))
+            if cache is not None:
+                address = ins.effective_address(sim, op)
+                last.append((op.location, address, cache.access(address)))
+            self.last = last
+        if self.log is not None:
+            self.log.append(self.last or None)
+
+    def describe(self, accesses: list[tuple[str, int, bool]]) -> str:
+        """One-line summary of a step's accesses for the step view"""
+        if not accesses:
+            return "Cache: no cached access"
+        return "Cache: " + ", ".join(f"{location} {ins.address_name(address)} {'hit' if hit else 'miss'}" for location, address, hit in accesses)
+
+    def stats(self) -> dict:
+        """JSON-serializable stats of every cache, None for uncached locations"""
+        return {location: cache.stats() if cache is not None else None for location, cache in self.caches.items()}
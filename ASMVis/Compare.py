@@ -0,0 +1,182 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import Instructions as ins
+from Batch import find_programs
+from Simulation import Simulation, default_max_steps, runtime_message
+import Trace as trc
+import Visualizer as v
+
+"""
+Differential comparison of student programs against a reference solution
+The reference is run once and its trace recorded; every submission is then run in lockstep against the
+trace and stopped at the first step after which its registers, memory or disk differ from the reference's
+Usage (from the ASMVis directory): python -m Compare <reference> <dir> [--pattern *.asm] [--workers N] [--max-steps N] [--trace FILE]
+"""
+
+
+class Comparator:
+
+    def __init__(self, reader: trc.TraceReader, sim: Simulation):
+        """The Comparator Constructor initializes the below variables:
+            - reader: reference trace the observed run is compared against
+            - initial: (registers, memory, disk) of sim when the comparison starts, the state the reference started from
+            - reference: (location code, address) -> value of every key the reference has written so far
+            - mismatches: keys whose current value differs between the run and the reference
+            - step: number of steps compared so far
+            - divergence: description of the first divergence, None while the states agree
+        """
+        self.reader = reader
+        self.initial = (array('q', sim.registers), dict(sim.memory), dict(sim.disk))
+        self.reference: dict[tuple[int, int], int] = {}
+        self.mismatches: set[tuple[int, int]] = set()
+        self.step = 0
+        self.divergence: dict = None
+
+    def initial_value(self, key: tuple[int, int]) -> int:
+        """Value of a key before either program wrote it, None for memory and disk addresses that held nothing"""
+        code, address = key
+        if code == 0:
+            return self.initial[0][address]
+        return self.initial[code].get(address)
+
+    def expected_value(self, key: tuple[int, int]) -> int:
+        """Value of a key in the reference's state after the steps compared so far"""
+        if key in self.reference:
+            return self.reference[key]
+        return self.initial_value(key)
+
+    def current_value(self, sim: Simulation, key: tuple[int, int]) -> int:
+        code, address = key
+        if code == 0:
+            return sim.registers[address]
+        return getattr(sim, trc.location_names[code]).get(address)
+
+    def __call__(self, sim: Simulation, index: int, op: ins.Instruction, target: tuple[str, int], next_index: int) -> bool:
+        """Observer hook applying the reference's step alongside the run's and stopping the run once the states differ"""
+        step = self.step
+        self.step += 1
+        if step >= len(self.reader):
+            self.divergence = self.describe("reference stopped", step + 1, index, None, None)
+            return True
+        reference_step, reference_index, opcode, code, address, value = self.reader[step]
+        touched: list[tuple[int, int]] = []
+        if code >= 0:
+            self.reference[(code, address)] = value
+            touched.append((code, address))
+        if target is not None:
+            touched.append((trc.location_codes[target[0]], target[1]))
+        for key in touched:
+            if self.current_value(sim, key) != self.expected_value(key):
+                self.mismatches.add(key)
+            else:
+                self.mismatches.discard(key)
+        if len(self.mismatches) > 0:
+            key = min(self.mismatches)
+            self.divergence = self.describe("state differs", step + 1, index, reference_index, key, sim)
+            return True
+        return False
+
+    def describe(self, reason: str, step: int, index: int, reference_index: int, key: tuple[int, int], sim: Simulation = None) -> dict:
+        """Builds the JSON-serializable divergence report
+        step counts executed steps, so seeking a timeline to it shows the diverged state; lines count non-empty program lines from 1
+        """
+        divergence = {"reason": reason, "step": step, "line": index + 1}
+        if reference_index is not None:
+            divergence["reference_line"] = reference_index + 1
+        if key is not None:
+            code, address = key
+            value = self.current_value(sim, key)
+            expected = self.expected_value(key)
+            divergence["location"] = trc.location_names[code]
+            divergence["address"] = f"r{address}" if code == 0 else ins.address_name(address)
+            divergence["value"] = None if value is None else str(value)
+            divergence["expected"] = None if expected is None else str(expected)
+        return divergence
+
+
+def record_reference(path: str, trace_path: str, max_steps: int = default_max_steps) -> dict:
+    """Assembles and runs the reference program once, recording its trace to trace_path
+    raises Exception when the reference does not assemble or stops at a runtime error
+    Returns the reference's step count and whether it halted
+    """
+    emul = Simulation(numeric=True)
+    message, lines = v.Assembler(path).start(emul)
+    if message != v.success_message:
+        raise Exception(f"Error:\nReference \"{path}\" does not assemble\n{message}")
+    try:
+        steps, seconds = trc.record_run(emul, trace_path, max_steps=max_steps)
+    except Exception as e:
+        raise Exception(f"Error:\nReference \"{path}\" stops at a runtime error\n{runtime_message(e, emul.curr_line)}")
+    return {"steps": steps, "halted": emul.halted}
+
+
+def compare_file(path: str, trace_path: str, max_steps: int = default_max_steps) -> dict:
+    """Runs one submission against the reference trace at trace_path
+    Returns a JSON-serializable report whose "divergence" is None when every step matched the reference
+    """
+    emul = Simulation(numeric=True)
+    report = {"file": path, "syntax": "", "ok": False, "match": False, "steps": 0}
+    try:
+        message, lines = v.Assembler(path).start(emul)
+    except Exception as e:
+        message, lines = e, []
+    report["syntax"] = str(message)
+    if len(lines) == 0:
+        return report
+    report["ok"] = True
+    with trc.TraceReader(trace_path) as reader:
+        comparator = Comparator(reader, emul)
+        emul.observers.append(comparator)
+        try:
+            report["steps"] = emul.run(max_steps=max_steps)[0]
+        except Exception as e:
+            report["error"] = runtime_message(e, emul.curr_line)
+        divergence = comparator.divergence
+        if divergence is None and "error" not in report and comparator.step < len(reader):
+            # the submission stopped (halt or step budget) while the reference kept running
+            reason = "halted early" if emul.halted else "step budget exhausted"
+            divergence = comparator.describe(reason, comparator.step, emul.curr_line, reader[comparator.step][1], None)
+        report["divergence"] = divergence
+        report["match"] = divergence is None and "error" not in report
+    return report
+
+
+def main(argv: list[str] = None) -> int:
+    arg_parser = argparse.ArgumentParser(prog="python -m Compare", description="Compare MiniASM programs step by step against a reference solution")
+    arg_parser.add_argument("reference")
+    arg_parser.add_argument("directory")
+    arg_parser.add_argument("--pattern", default="*.asm", help="glob pattern for program files (default: *.asm)")
+    arg_parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    arg_parser.add_argument("--max-steps", type=int, default=default_max_steps, help="step budget per program")
+    arg_parser.add_argument("--trace", default=None, help="keep the reference trace at this path (default: a temporary file)")
+    args = arg_parser.parse_args(argv)
+    trace_path = args.trace
+    if trace_path is None:
+        handle, trace_path = tempfile.mkstemp(suffix=".trace")
+        os.close(handle)
+    try:
+        try:
+            reference = record_reference(args.reference, trace_path, args.max_steps)
+        except Exception as e:
+            print(e, file=sys.stderr)
+            return 1
+        print(json.dumps({"reference": args.reference, **reference}), flush=True)
+        paths = [path for path in find_programs(args.directory, args.pattern) if os.path.abspath(path) != os.path.abspath(args.reference)]
+        workers = args.workers or os.cpu_count() or 1
+        chunksize = max(1, len(paths) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for report in executor.map(compare_file, paths, [trace_path] * len(paths), [args.max_steps] * len(paths), chunksize=chunksize):
+                print(json.dumps(report), flush=True)
+    finally:
+        if args.trace is None:
+            os.remove(trace_path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+import json
+from array import array
+import Grammar as grm
+import Instructions as ins
+
+"""
+Cycle and bus-traffic accounting for compiled MiniASM runs
+A CostModel is a Simulation observer charging every step:
+    - the cycles of its opcode (arithmetic, control flow, loads and stores alike)
+    - a penalty per memory word and a much larger one per disk word moved over the bus
+    - extra cycles for the address arithmetic of the index and relative addressing modes
+      and for the pointer dereference of the indirect mode, charged by the mode written in the source
+The cost of an operation only depends on its opcode and addressing mode, so costs are tabulated once per pair
+"""
+
+default_cycles: dict[str, int] = {"halt": 1, "skip": 1, "load_immediate": 1, "move": 1, "add": 1, "sub": 1, "mul": 4, "div": 12,
+                                  "inc": 1, "br": 1, "branch": 2}
+# MiniASM instructions a cost file may name, each charging every compiled opcode it assembles to
+# register to register transfers ("load r1, r2") compile to move, named on its own
+mnemonic_opcodes: dict[str, tuple[str, ...]] = {
+    "load": ("load_immediate", "load_memory", "load_memory_offset", "load_memory_pair", "load_indirect"),
+    "store": ("store_memory", "store_memory_offset", "store_memory_pair"),
+    "read": ("load_disk", "load_disk_offset", "load_disk_pair"),
+    "write": ("store_disk", "store_disk_offset", "store_disk_pair"),
+    **{name: ("branch",) for name in grm.branches}
+}
+default_memory_penalty: int = 10
+default_disk_penalty: int = 1000
+default_indexed_penalty: int = 1
+default_indirect_penalty: int = 2
+# addressing modes of Instruction.mode, None for operations that have none
+modes: tuple[str, ...] = (None, "immediate", "direct", "relative", "index", "indirect")
+
+
+def bus_words(opcode: int) -> tuple[int, int]:
+    """Returns the (memory words, disk words) an operation moves over the bus"""
+    name = ins.opcode_names[opcode]
+    if name == "load_indirect":
+        return 2, 0 # the pointer, then the word it points to
+    elif name.startswith(("load_memory", "store_memory")):
+        return 1, 0
+    elif name.startswith(("load_disk", "store_disk")):
+        return 0, 1
+    return 0, 0
+
+
+class CostModel:
+
+    def __init__(self, cycles: dict[str, int] = None, memory_penalty: int = default_memory_penalty, disk_penalty: int = default_disk_penalty,
+                 indexed_penalty: int = default_indexed_penalty, indirect_penalty: int = default_indirect_penalty):
+        """The CostModel Constructor initializes the below variables:
+            - cycles: cycles per compiled opcode name; loads and stores take the "move" cycles plus their penalties
+              unless named, and names missing from cycles keep their default
+              The cycles argument may name MiniASM instructions, e.g. {"load": 3, "write": 5, "blt": 2}, charging every
+              opcode they compile to, or compiled opcodes such as "load_memory_offset", which take precedence
+            - memory_penalty, disk_penalty: cycles charged per memory and disk word moved
+            - indexed_penalty: cycles charged for the address addition of the index and relative modes
+            - indirect_penalty: cycles charged for dereferencing the pointer of the indirect mode
+            - step_costs: addressing mode -> cycles of every opcode in that mode
+            - step_memory, step_disk: memory and disk words of every opcode
+            - cycles_total, memory_total, disk_total, steps: totals over the steps seen so far
+            - opcode_cycles: cycles spent per opcode so far
+            - last: cycles of the latest step
+        raises Exception for names that are neither MiniASM instructions nor opcodes
+        """
+        self.cycles = dict(default_cycles)
+        cycles = cycles or {}
+        for name, count in cycles.items():
+            if name in mnemonic_opcodes:
+                for opcode_name in mnemonic_opcodes[name]:
+                    self.cycles[opcode_name] = count
+            elif name not in ins.opcodes:
+                raise Exception(f"Error:\nCost model -> \"{name}\" is not a MiniASM instruction or opcode")
+        for name, count in cycles.items():
+            if name in ins.opcodes:
+                self.cycles[name] = count
+        self.memory_penalty = memory_penalty
+        self.disk_penalty = disk_penalty
+        self.indexed_penalty = indexed_penalty
+        self.indirect_penalty = indirect_penalty
+        base_costs: list[int] = []
+        self.step_memory: list[int] = []
+        self.step_disk: list[int] = []
+        for opcode, name in enumerate(ins.opcode_names):
+            memory, disk = bus_words(opcode)
+            base_costs.append(self.cycles.get(name, self.cycles["move"]) + memory * memory_penalty + disk * disk_penalty)
+            self.step_memory.append(memory)
+            self.step_disk.append(disk)
+        self.step_costs: dict[str, list[int]] = {}
+        for mode in modes:
+            penalty = indexed_penalty if mode in ("index", "relative") else indirect_penalty if mode == "indirect" else 0
+            self.step_costs[mode] = [cost + penalty for cost in base_costs]
+        self.reset()
+
+    @classmethod
+    def from_settings(cls, settings: dict) -> "CostModel":
+        """Builds a cost model from a dict holding any of the constructor's arguments by name
+        raises Exception when the settings are not those arguments
+        """
+        try:
+            return cls(**settings)
+        except TypeError:
+            raise Exception("Error:\nCost model -> expected a JSON object with cycles, memory_penalty, disk_penalty, indexed_penalty or indirect_penalty")
+
+    @classmethod
+    def load(cls, path: str) -> "CostModel":
+        """Builds a cost model from a JSON settings file, see from_settings"""
+        with open(path, 'r') as file:
+            return cls.from_settings(json.load(file))
+
+    def reset(self):
+        """Clears the totals"""
+        self.cycles_total = 0
+        self.memory_total = 0
+        self.disk_total = 0
+        self.steps = 0
+        self.opcode_cycles = array('q', bytes(8 * len(ins.opcode_names)))
+        self.last = 0
+
+    def attach(self, sim) -> "CostModel":
+        """Registers the model as an observer of sim and returns it"""
+        sim.observers.append(self)
+        return self
+
+    def detach(self, sim):
+        """Stops charging sim's steps, keeping the totals"""
+        if self in sim.observers:
+            sim.observers.remove(self)
+
+    def __call__(self, sim, index: int, op: ins.Instruction, target: tuple[str, int], next_index: int):
+        """Observer hook charging the step that just executed op at index"""
+        opcode = op.opcode
+        cost = self.step_costs[op.mode][opcode]
+        self.last = cost
+        self.cycles_total += cost
+        self.opcode_cycles[opcode] += cost
+        self.memory_total += self.step_memory[opcode]
+        self.disk_total += self.step_disk[opcode]
+        self.steps += 1
+
+    def describe(self, op: ins.Instruction) -> str:
+        """One-line breakdown of an operation's cost for the step view"""
+        memory, disk = self.step_memory[op.opcode], self.step_disk[op.opcode]
+        text = f"Cost: {self.step_costs[op.mode][op.opcode]} cycles"
+        if memory + disk > 0:
+            text += f" ({memory} memory, {disk} disk words)"
+        return text
+
+    def totals(self) -> dict:
+        """JSON-serializable totals: cycles, bus words, cycles per step and cycles per opcode"""
+        return {"cycles": self.cycles_total, "memory_words": self.memory_total, "disk_words": self.disk_total,
+                "cycles_per_step": round(self.cycles_total / self.steps, 3) if self.steps > 0 else 0.0,
+                "opcodes": {ins.opcode_names[opcode]: cycles for opcode, cycles in enumerate(self.opcode_cycles) if cycles > 0}}
@@ -8,6 +8,8 @@ Defines the syntactic structure of MiniASM and token productions
 """
 
 
+# bump grammar_version whenever tokens, productions or skeleton encoding change, invalidating cached assemblies
+grammar_version: str = "3"
 instructions: set[str] = {"load", "store", "read", "write"} 
 arithmetic: dict[str,str] = {"add":"+", "sub":"-", "div":"/", "mul":"*"} 
 increment: str = "inc"
@@ -15,6 +17,19 @@ branch: str = "br"
 address_modes: dict[str,str] = {"$":"relative", "@":"indirect", "[":"index", "=":"immediate", "]":"index", ",":""}
 branches: dict[str,str] = {"blt":"<", "bgt":">", "bleq":"<=", "bgeq":">=", "beq":"==", "bneq":"!="}
 labels: set[str] = set()
+line_tokens: list[str] = []
+registers: frozenset[str] = frozenset(f"r{i}" for i in range(17))
+digits: str = "0123456789"
+number_pattern = re.compile("[0-9]+")
+
+# token_types is the dispatch table used by get_type, resolving every fixed token in one look-up
+token_types: dict[str,str] = {reg: "reg" for reg in registers}
+token_types.update({instruction: instruction for instruction in instructions})
+token_types.update({operation: "arithmetic" for operation in arithmetic})
+token_types.update({condition: "branch" for condition in branches})
+token_types.update({mode: mode for mode in address_modes})
+# late_types are only keywords when no label of the same name exists
+late_types: dict[str,str] = {"br": "br", "skip": "skip", "halt": "halt", "inc": "inc"}
 
 productions: dict[str,list[str]] = {
     "label": ["production"],
@@ -52,84 +67,163 @@ transitions: dict[str, set[str]] = {
 }
 
 
-def follow_transition(non_terminal: str, token_index: int, line_index: int, t_types: list[str]):
-    """The follow_transition method determines any possible transitions from a type determination
+# LL(1) parse table built once from productions and transitions
+# expansion_stacks holds every production reversed, ready to be pushed onto the parse stack
+# parse_table maps each non-terminal to {token type: expansion}; symbols without an entry are terminals
+expansion_stacks: dict[str, tuple[str, ...]] = {name: tuple(reversed(production)) for name, production in productions.items()}
+parse_table: dict[str, dict[str, tuple[str, ...]]] = {
+    non_terminal: {t_type: expansion_stacks[t_type] for t_type in transition}
+    for non_terminal, transition in transitions.items() if len(transition) > 0
+}
+start_types: frozenset[str] = frozenset(transitions["production"]) | {"label"}
+
+
+class ParseError(Exception):
+
+    def __init__(self, message: str, line: int = None, token: str = None, expected: tuple[str, ...] = ()):
+        """The ParseError Constructor initializes the below variables:
+            - line: non-empty line number, counted from 1, the error was found on
+            - token: the offending token, None when the line ended before the production did
+            - expected: grammar symbols that would have been accepted in its place
+        str() of a ParseError is the message the parser has always reported
+        """
+        super().__init__(message)
+        self.line = line
+        self.token = token
+        self.expected = expected
+
+    def diagnostic(self) -> dict:
+        """JSON-serializable form of the error"""
+        return {"line": self.line, "token": self.token, "expected": list(self.expected), "message": str(self)}
+
+
+class Parser:
+
+    def __init__(self):
+        """The Parser Constructor initializes the below variables:
+            - labels: stores every label defined so far in the program being parsed
+            - line_tokens: token buffer for the line currently being parsed
+        Each Parser owns its state, so separate programs can be parsed concurrently
+        """
+        self.labels: set[str] = set()
+        self.line_tokens: list[str] = []
+
+    def expand(self, stack: list[str], token_index: int, line_index: int, t_types: list[str]) -> int:
+        """The expand method drives the LL(1) parse of the symbols on stack, top of stack first
+        Each token is typed once and matched against the top symbol: terminals must equal the token type,
+        non-terminals are replaced by the parse_table expansion for the token type
+        Returns the index of the first token left unparsed
+        """
+        line_tokens: list[str] = self.line_tokens
+        token_count: int = len(line_tokens)
+        get_type = self.get_type
+        while stack:
+            symbol: str = stack.pop()
+            if token_index >= token_count:
+                # Check that the number of tokens left in production does not exceed the length of user input
+                raise ParseError(f"Error:\nLine {line_index} -> Reached end of token sequence\nExpected \"{symbol}\"", line_index, None, (symbol,))
+            token: str = line_tokens[token_index].lower()
+            t_type: str = get_type(token)
+            t_types.append(t_type)
+            token_index += 1
+            expansions: dict[str, tuple[str, ...]] = parse_table.get(symbol)
+            if expansions is None:
+                if symbol != t_type:
+                    raise ParseError(f"Error:\nLine {line_index} -> Got token: \"{token}\" of type: \"{t_type}\"\nExpected \"{symbol}\"", line_index, token, (symbol,))
+                continue
+            expansion: tuple[str, ...] = expansions.get(t_type)
+            if expansion is None:
+                raise ParseError(f"Error\nLine {line_index} -> Got token: \"{token}\" of type: \"{t_type}\"\nExpected one of {transitions[symbol]}",
+                                 line_index, token, tuple(sorted(transitions[symbol])))
+            stack.extend(expansion)
+        return token_index
+
+    def follow_transition(self, non_terminal: str, token_index: int, line_index: int, t_types: list[str]):
+        """The follow_transition method matches a single grammar symbol, and anything it expands to, starting at token_index
+        """
+        self.expand([non_terminal], token_index, line_index, t_types)
+
+    def follow(self, non_term: str, line_index: int, token_index: int, t_types: list[str]):
+        """The follow method follows a specific production, typing every token the production covers
+        Production is determined as a dictionary value
+        """
+        self.expand(list(expansion_stacks[non_term]), token_index, line_index, t_types)
+
+    def hash_parse(self, line_index: int, token_index: int):
+        """The hash_parse method acts as entry point for MiniASM parser
+        Takes an int param line_index which is used for more descriptive exceptions and an int param
+        token_index to keep track of the token being parsed
+        raise ParseError when a token should not begin a production, or from any later error on the line
+        """
+        token: str = self.line_tokens[token_index].lower()
+        try:
+            t_type: str = self.get_type(token)
+            t_types: list[str] = [t_type]
+            if t_type not in start_types:
+                raise ParseError(f"Error:\nLine {line_index} -> Got token: \"{token}\"\nNot a valid start to a production", line_index, token, tuple(sorted(start_types)))
+            self.expand(list(expansion_stacks[t_type]), token_index+1, line_index, t_types)
+        except ParseError as e:
+            # get_type does not know the line it types tokens for
+            if e.line is None:
+                e.line = line_index
+            raise
+        return t_types
+
+    def parse(self, tokens: list[str], line_index: int) -> list[str]:
+        """Loads tokens into the token buffer and parses them as a single line"""
+        self.line_tokens = tokens
+        return self.hash_parse(line_index, 0)
+
+    def get_type(self, token: str) -> str:
+        """The get_type method determines the type of a specific token through a single hash look-up,
+        falling back to a precompiled number pattern for anything outside the keyword table
+        Takes a String param token and returns token type
+        raises ParseError when two different labels share the same name
+        """
+        t_type = token_types.get(token)
+        if t_type is not None:
+            return t_type
+        if len(token) > 1 and token[-1] == ":":
+            if token in self.labels:
+                raise ParseError(f"Error:\nThe label \"{token}\" has already been defined elsewhere\nno two labels can have the same name", None, token)
+            self.labels.add(token)
+            return "label"
+        if token[:1] in digits and number_pattern.fullmatch(token):
+            return "num"
+        t_type = late_types.get(token)
+        if t_type is not None and token + ":" not in self.labels:
+            # a defined label shadows br, skip, halt and inc when used as an operand
+            return t_type
+        return "id"
+
+
+default_parser = Parser()
+
+
+def module_parser() -> Parser:
+    """Binds the module-level labels and line_tokens to the shared default parser
+    Keeps the module functions below usable as thin wrappers for single-program callers
     """
-    if token_index >= len(line_tokens):
-        # Check that the number of tokens left in production does not exceed the length of user input
-        raise Exception(f"Error:\nLine {line_index} -> Reached end of token sequence\nExpected \"{non_terminal}\"")
-    token: str = line_tokens[token_index].lower()
-    t_type: str = get_type(token)
-    t_types.append(t_type)
-    transition: set[str] = transitions[non_terminal]
-    if len(transition) > 0:
-        if t_type not in transition:
-            raise Exception(f"Error\nLine {line_index} -> Got token: \"{token}\" of type: \"{t_type}\"\nExpected one of {transition}")
-        next_t: str = t_type
-        follow(next_t, line_index, token_index+1, t_types)
-    else:
-        if non_terminal != t_type:
-            raise Exception(f"Error:\nLine {line_index} -> Got token: \"{token}\" of type: \"{t_type}\"\nExpected \"{non_terminal}\"")
+    default_parser.labels = labels
+    default_parser.line_tokens = line_tokens
+    return default_parser
+
+
+def follow_transition(non_terminal: str, token_index: int, line_index: int, t_types: list[str]):
+    """Module wrapper for Parser.follow_transition on the default parser"""
+    module_parser().follow_transition(non_terminal, token_index, line_index, t_types)
 
 
 def follow(non_term: str, line_index: int, token_index: int, t_types: list[str]):
-    """The follow method follows a specific production, returning any possible transition tokens
-    Production is determined as a dictionary value
-    Calls follow_transition method which will determine the transitions possible from a production token
-    """
-    production: list[str] = productions[non_term]
-    for non_terminal in production:
-        follow_transition(non_terminal, token_index, line_index, t_types)
-        token_index += 1
+    """Module wrapper for Parser.follow on the default parser"""
+    module_parser().follow(non_term, line_index, token_index, t_types)
 
 
 def hash_parse(line_index: int, token_index: int):
-    """The hash_parse method acts as entry point for MiniASM parser
-    Takes an int param line_index which is used for more descriptive exceptions and an int param
-    token_index to keep track of the token being parsed
-    raise Exception when a token should not begin a production
-    """
-    token: str = line_tokens[token_index].lower()
-    t_types: list[str] = []
-    t_type: str = get_type(token)
-    t_types.append(t_type)
-    if t_type != "label" and t_type not in transitions["production"]:
-        raise Exception(f"Error:\nLine {line_index} -> Got token: \"{token}\"\nNot a valid start to a production")
-    follow(t_type, line_index, token_index+1, t_types)
-    return t_types
+    """Module wrapper for Parser.hash_parse on the default parser"""
+    return module_parser().hash_parse(line_index, token_index)
 
 
 def get_type(token: str) -> str:
-    """The get_type method determines the type of a specific token through regex matches and hash look-ups
-    Takes a String param token and returns token type
-    raises Exception when two different labels share the same name
-    """
-    if re.match(".+:$", token):
-        if token in labels:
-            raise Exception(f"Error:\nThe label \"{token}\" has already been defined elsewhere\nno two labels can have the same name")
-        labels.add(token)
-        return "label"
-    elif re.match("^r[0-9]$|^r1[0-6]$", token):
-        return "reg"
-    elif re.match("^[0-9]+$", token):
-        return "num"
-    elif token in instructions:
-        return token
-    elif token in arithmetic:
-        return "arithmetic"
-    elif token in branches:
-        return "branch"
-    elif token in address_modes:
-        return token
-    elif token + ":" in labels:
-        return "id"
-    elif token == "br":
-        return "br"
-    elif token == "skip":
-        return "skip"
-    elif token == "halt":
-        return "halt"
-    elif token == "inc":
-        return "inc"
-    else:
-        return "id"
+    """Module wrapper for Parser.get_type on the default parser"""
+    return module_parser().get_type(token)
@@ -0,0 +1,264 @@
+"""
+Pre-decoded instruction records and the handler table used by Simulation.run
+Simulation.compile turns operation_log skeletons into Instruction records once, so the run loop
+no longer dispatches on opcode strings or re-parses operands on every step
+Handlers operate on the numeric machine state of a Simulation:
+    - registers: r0-r16 indexed by register number
+    - memory, disk: sparse maps from integer address to integer value
+"""
+
+register_count: int = 17
+# Relative (PC-based) addresses are symbolic offsets from the program base "x"
+# They are stored numerically as relative_base + offset so they never collide with absolute addresses
+relative_base: int = 1 << 40
+
+opcode_names: tuple[str, ...] = (
+    "halt", "skip", "load_immediate", "move",
+    "load_memory", "load_disk", "load_memory_offset", "load_disk_offset", "load_memory_pair", "load_disk_pair", "load_indirect",
+    "store_memory", "store_disk", "store_memory_offset", "store_disk_offset", "store_memory_pair", "store_disk_pair",
+    "add", "sub", "mul", "div", "inc", "br", "branch"
+)
+opcodes: dict[str, int] = {name: opcode for opcode, name in enumerate(opcode_names)}
+# halt returns halted - index, a negative value from which run recovers the halting index
+halted: int = -1
+
+
+class Instruction:
+    """Compact pre-decoded operation
+        - opcode: integer id from opcodes
+        - handler: function executing the operation, taken from handlers
+        - register: data register (destination of loads and arithmetic, source of stores)
+        - operand: second register (move source, address offset, arithmetic and comparison operand)
+        - base: base register of an index address held in a register
+        - value: integer constant (immediate value, absolute address or address base)
+        - target: resolved operation index of a branch label
+        - location: "registers", "memory" or "disk", the location the operation addresses
+        - mode: source addressing mode of loads and stores ("immediate", "direct", "relative", "index" or "indirect"), None otherwise
+        - compare: comparison function for conditional branches
+    """
+    __slots__ = ("opcode", "handler", "register", "operand", "base", "value", "target", "location", "compare", "mode")
+
+    def __init__(self, opcode: str, register: int = -1, operand: int = -1, base: int = -1, value: int = 0,
+                 target: int = -1, location: str = "registers", compare=None, mode: str = None):
+        self.opcode = opcodes[opcode]
+        self.handler = handlers[self.opcode]
+        self.register = register
+        self.operand = operand
+        self.base = base
+        self.value = value
+        self.target = target
+        self.location = location
+        self.compare = compare
+        self.mode = mode
+
+    def __repr__(self) -> str:
+        return f"Instruction({opcode_names[self.opcode]}, register={self.register}, operand={self.operand}, base={self.base}, value={self.value}, target={self.target})"
+
+
+def register_index(token: str) -> int:
+    """Converts a register token such as r12 to its register number"""
+    return int(token[1:])
+
+
+def relative_name(offset: int) -> str:
+    """Formats a PC-relative offset as its symbolic address"""
+    if offset == 0:
+        return "x"
+    elif offset > 0:
+        return f"x+{offset}"
+    return f"x{offset}"
+
+
+def address_key(name: str) -> int:
+    """Converts a history address string (e.g. 12 or x+184) to its integer key
+    raises ValueError for addresses that are neither numbers nor relative addresses
+    """
+    if name[:1] == "x":
+        return relative_base + (int(name[1:]) if len(name) > 1 else 0)
+    return int(name)
+
+
+def address_name(key: int) -> str:
+    """Converts an integer address key back to its history address string"""
+    if key >= relative_base >> 1:
+        return relative_name(key - relative_base)
+    return str(key)
+
+
+# Addressing of memory and disk operations: constant address, value + offset register, base + offset register
+address_forms: dict[int, str] = {
+    opcodes["load_memory"]: "constant", opcodes["load_disk"]: "constant",
+    opcodes["store_memory"]: "constant", opcodes["store_disk"]: "constant",
+    opcodes["load_memory_offset"]: "offset", opcodes["load_disk_offset"]: "offset",
+    opcodes["store_memory_offset"]: "offset", opcodes["store_disk_offset"]: "offset",
+    opcodes["load_memory_pair"]: "pair", opcodes["load_disk_pair"]: "pair",
+    opcodes["store_memory_pair"]: "pair", opcodes["store_disk_pair"]: "pair",
+    opcodes["load_indirect"]: "indirect"
+}
+store_opcodes: frozenset[int] = frozenset(opcodes[name] for name in opcode_names if name.startswith("store_"))
+control_opcodes: frozenset[int] = frozenset(opcodes[name] for name in ("halt", "skip", "br", "branch"))
+
+
+def effective_address(sim, op: Instruction) -> int:
+    """Returns the memory or disk address op accesses given the current machine state"""
+    form = address_forms[op.opcode]
+    if form == "offset":
+        return op.value + sim.registers[op.operand]
+    elif form == "pair":
+        return sim.registers[op.base] + sim.registers[op.operand]
+    elif form == "indirect":
+        return sim.memory.get(op.value, 0)
+    return op.value
+
+
+def destination(sim, op: Instruction) -> tuple[str, int]:
+    """Returns the (location, address) op writes given the current machine state
+    Returns None for control flow operations, which write nothing
+    """
+    if op.opcode in control_opcodes:
+        return None
+    elif op.opcode in store_opcodes:
+        return op.location, effective_address(sim, op)
+    return "registers", op.register
+
+
+def op_halt(sim, op: Instruction, index: int) -> int:
+    return halted - index
+
+
+def op_skip(sim, op: Instruction, index: int) -> int:
+    return index + 1
+
+
+def op_load_immediate(sim, op: Instruction, index: int) -> int:
+    sim.registers[op.register] = op.value
+    return index + 1
+
+
+def op_move(sim, op: Instruction, index: int) -> int:
+    registers = sim.registers
+    registers[op.register] = registers[op.operand]
+    return index + 1
+
+
+def op_load_memory(sim, op: Instruction, index: int) -> int:
+    sim.registers[op.register] = sim.memory.get(op.value, 0)
+    return index + 1
+
+
+def op_load_disk(sim, op: Instruction, index: int) -> int:
+    sim.registers[op.register] = sim.disk.get(op.value, 0)
+    return index + 1
+
+
+def op_load_memory_offset(sim, op: Instruction, index: int) -> int:
+    registers = sim.registers
+    registers[op.register] = sim.memory.get(op.value + registers[op.operand], 0)
+    return index + 1
+
+
+def op_load_disk_offset(sim, op: Instruction, index: int) -> int:
+    registers = sim.registers
+    registers[op.register] = sim.disk.get(op.value + registers[op.operand], 0)
+    return index + 1
+
+
+def op_load_memory_pair(sim, op: Instruction, index: int) -> int:
+    registers = sim.registers
+    registers[op.register] = sim.memory.get(registers[op.base] + registers[op.operand], 0)
+    return index + 1
+
+
+def op_load_disk_pair(sim, op: Instruction, index: int) -> int:
+    registers = sim.registers
+    registers[op.register] = sim.disk.get(registers[op.base] + registers[op.operand], 0)
+    return index + 1
+
+
+def op_load_indirect(sim, op: Instruction, index: int) -> int:
+    memory = sim.memory
+    sim.registers[op.register] = memory.get(memory.get(op.value, 0), 0)
+    return index + 1
+
+
+def op_store_memory(sim, op: Instruction, index: int) -> int:
+    sim.memory[op.value] = sim.registers[op.register]
+    return index + 1
+
+
+def op_store_disk(sim, op: Instruction, index: int) -> int:
+    sim.disk[op.value] = sim.registers[op.register]
+    return index + 1
+
+
+def op_store_memory_offset(sim, op: Instruction, index: int) -> int:
+    registers = sim.registers
+    sim.memory[op.value + registers[op.operand]] = registers[op.register]
+    return index + 1
+
+
+def op_store_disk_offset(sim, op: Instruction, index: int) -> int:
+    registers = sim.registers
+    sim.disk[op.value + registers[op.operand]] = registers[op.register]
+    return index + 1
+
+
+def op_store_memory_pair(sim, op: Instruction, index: int) -> int:
+    registers = sim.registers
+    sim.memory[registers[op.base] + registers[op.operand]] = registers[op.register]
+    return index + 1
+
+
+def op_store_disk_pair(sim, op: Instruction, index: int) -> int:
+    registers = sim.registers
+    sim.disk[registers[op.base] + registers[op.operand]] = registers[op.register]
+    return index + 1
+
+
+def op_add(sim, op: Instruction, index: int) -> int:
+    registers = sim.registers
+    registers[op.register] += registers[op.operand]
+    return index + 1
+
+
+def op_sub(sim, op: Instruction, index: int) -> int:
+    registers = sim.registers
+    registers[op.register] -= registers[op.operand]
+    return index + 1
+
+
+def op_mul(sim, op: Instruction, index: int) -> int:
+    registers = sim.registers
+    registers[op.register] *= registers[op.operand]
+    return index + 1
+
+
+def truncate_div(dividend: int, divisor: int) -> int:
+    """Integer division rounding toward zero, exact for any operand size unlike int(dividend / divisor)"""
+    quotient = abs(dividend) // abs(divisor)
+    return -quotient if (dividend < 0) != (divisor < 0) else quotient
+
+
+def op_div(sim, op: Instruction, index: int) -> int:
+    registers = sim.registers
+    registers[op.register] = truncate_div(registers[op.register], registers[op.operand])
+    return index + 1
+
+
+def op_inc(sim, op: Instruction, index: int) -> int:
+    sim.registers[op.register] += 1
+    return index + 1
+
+
+def op_br(sim, op: Instruction, index: int) -> int:
+    return op.target
+
+
+def op_branch(sim, op: Instruction, index: int) -> int:
+    registers = sim.registers
+    if op.compare(registers[op.register], registers[op.operand]):
+        return op.target
+    return index + 1
+
+
+handlers: list = [globals()["op_" + name] for name in opcode_names]
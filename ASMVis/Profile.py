@@ -0,0 +1,177 @@
+import argparse
+import json
+import sys
+from array import array
+from CostModel import CostModel
+import Instructions as ins
+from Simulation import Simulation, default_max_steps, runtime_message
+import Visualizer as v
+
+"""
+Execution profiles of compiled MiniASM runs
+A Profile is a Simulation probe counting, for every step before it executes:
+    - executions of each operation index (non-empty program lines counted from 0)
+    - taken and not-taken outcomes of each branch
+    - memory and disk accesses per address, reads and writes alike
+Nothing is counted while no profile is attached, and run keeps its unobserved loop
+The CLI also charges the run with the default CostModel
+Usage (from the ASMVis directory): python -m Profile <file> [--max-steps N] [--top N] [--width N] [--json]
+"""
+
+branch_opcode: int = ins.opcodes["branch"]
+br_opcode: int = ins.opcodes["br"]
+indirect_opcode: int = ins.opcodes["load_indirect"]
+heat_bars: str = " ▏▎▍▌▋▊▉█" # eighths of a character cell, for the text heatmap
+
+
+class Profile:
+
+    def __init__(self):
+        """The Profile Constructor initializes the below variables:
+            - executions: number of times each operation index executed
+            - taken, not_taken: per operation index, how often a branch jumped or fell through (br always jumps)
+            - accesses: "memory" and "disk" maps of address key -> number of reads and writes
+        Attach a profile to a Simulation after its program is assembled, as assembling discards it
+        """
+        self.executions = array('q')
+        self.taken = array('q')
+        self.not_taken = array('q')
+        self.accesses: dict[str, dict[int, int]] = {"memory": {}, "disk": {}}
+
+    def attach(self, sim) -> "Profile":
+        """Sizes the counters for sim's program (compiling it when needed), registers the profile as a probe of sim and returns it"""
+        program = sim.program
+        if program is None:
+            program = sim.compile()
+        missing = len(program) - len(self.executions)
+        if missing > 0:
+            for counters in (self.executions, self.taken, self.not_taken):
+                counters.extend(array('q', bytes(8 * missing)))
+        sim.probes.append(self)
+        return self
+
+    def detach(self, sim):
+        """Stops profiling sim, keeping the counts"""
+        if self in sim.probes:
+            sim.probes.remove(self)
+
+    def __call__(self, sim, index: int, op: ins.Instruction):
+        """Probe hook counting the step about to execute op at index
+        Runs before the step so addresses are computed from the registers the operation reads
+        """
+        self.executions[index] += 1
+        opcode = op.opcode
+        if opcode == branch_opcode:
+            registers = sim.registers
+            if op.compare(registers[op.register], registers[op.operand]):
+                self.taken[index] += 1
+            else:
+                self.not_taken[index] += 1
+        elif opcode == br_opcode:
+            self.taken[index] += 1
+        elif opcode in ins.address_forms:
+            accesses = self.accesses[op.location]
+            if opcode == indirect_opcode:
+                # the pointer is read before the address it holds
+                accesses[op.value] = accesses.get(op.value, 0) + 1
+            address = ins.effective_address(sim, op)
+            accesses[address] = accesses.get(address, 0) + 1
+
+    def steps(self) -> int:
+        """Total number of profiled steps"""
+        return sum(self.executions)
+
+    def heat(self) -> list[float]:
+        """Executions of every operation index relative to the most executed one, from 0.0 to 1.0"""
+        hottest = max(self.executions, default=0)
+        if hottest == 0:
+            return [0.0] * len(self.executions)
+        return [count / hottest for count in self.executions]
+
+    def hot_lines(self, top: int = None) -> list[int]:
+        """Operation indexes that executed, most executed first (ties in program order), at most top of them"""
+        executed = sorted((index for index, count in enumerate(self.executions) if count > 0), key=lambda index: -self.executions[index])
+        return executed if top is None else executed[:top]
+
+    def hot_addresses(self, location: str, top: int = None) -> list[tuple[int, int]]:
+        """(address key, accesses) of location, most accessed first, at most top of them"""
+        ranked = sorted(self.accesses[location].items(), key=lambda item: (-item[1], item[0]))
+        return ranked if top is None else ranked[:top]
+
+    def summary(self, lines: list[list[str]] = None, top: int = 10) -> dict:
+        """Builds a JSON-serializable report of the top hot lines, branches and addresses
+        lines are the token lists of the program's non-empty lines, adding each hot line's source when given
+        """
+        steps = self.steps()
+        hot: list[dict] = []
+        for index in self.hot_lines(top):
+            line = {"line": index + 1, "executions": self.executions[index], "share": round(self.executions[index] / steps, 4)}
+            if lines is not None:
+                line["source"] = " ".join(lines[index])
+            hot.append(line)
+        branches = [{"line": index + 1, "taken": self.taken[index], "not_taken": self.not_taken[index]}
+                    for index in range(len(self.executions)) if self.taken[index] + self.not_taken[index] > 0]
+        report = {"steps": steps, "hot_lines": hot, "branches": branches}
+        for location in ("memory", "disk"):
+            report[location] = {ins.address_name(key): count for key, count in self.hot_addresses(location, top)}
+        return report
+
+    def heatmap(self, lines: list[list[str]], width: int = 20) -> list[str]:
+        """Renders every program line beside its execution count and a bar scaled to the hottest line"""
+        rows: list[str] = []
+        digits = len(str(max(self.executions, default=0)))
+        for index, (heat, tokens) in enumerate(zip(self.heat(), lines)):
+            cells = round(heat * width * 8)
+            bar = heat_bars[-1] * (cells // 8) + (heat_bars[cells % 8] if cells % 8 else "")
+            rows.append(f"{self.executions[index]:>{digits}} {bar:<{width}} {index+1:>4}: {' '.join(tokens)}")
+        return rows
+
+
+def profile_run(sim, index: int = 0, max_steps: int = default_max_steps) -> tuple[Profile, int, float]:
+    """Runs sim's program from index with a fresh profile attached
+    Returns the profile and run's (steps, seconds)
+    """
+    profile = Profile().attach(sim)
+    try:
+        steps, seconds = sim.run(index, max_steps)
+    finally:
+        profile.detach(sim)
+    return profile, steps, seconds
+
+
+def main(argv: list[str] = None) -> int:
+    arg_parser = argparse.ArgumentParser(prog="python -m Profile", description="Run a MiniASM program and show where its steps go")
+    arg_parser.add_argument("file")
+    arg_parser.add_argument("--max-steps", type=int, default=default_max_steps, help="step budget for the run")
+    arg_parser.add_argument("--top", type=int, default=10, help="hot lines and addresses to list (default: 10)")
+    arg_parser.add_argument("--width", type=int, default=20, help="heatmap bar width in characters (default: 20)")
+    arg_parser.add_argument("--json", action="store_true", help="print the summary as JSON instead of the heatmap")
+    args = arg_parser.parse_args(argv)
+    emul = Simulation(numeric=True)
+    message, lines = v.Assembler(args.file).start(emul)
+    if message != v.success_message:
+        print(message, file=sys.stderr)
+        return 1
+    profile = Profile().attach(emul)
+    model = CostModel().attach(emul)
+    try:
+        emul.run(max_steps=args.max_steps)
+    except Exception as e:
+        print(runtime_message(e, emul.curr_line), file=sys.stderr)
+    if args.json:
+        print(json.dumps({**profile.summary(lines, args.top), "cost": model.totals()}))
+        return 0
+    print("\n".join(profile.heatmap(lines, args.width)))
+    summary = profile.summary(lines, args.top)
+    print(f"\n{summary['steps']} steps{'' if emul.halted else ' (did not halt)'}, {model.cycles_total} cycles"
+          f" ({model.memory_total} memory and {model.disk_total} disk words moved)")
+    for branch in summary["branches"]:
+        print(f"branch on line {branch['line']}: taken {branch['taken']}, not taken {branch['not_taken']}")
+    for location in ("memory", "disk"):
+        if len(summary[location]) > 0:
+            print(f"{location}: " + ", ".join(f"{address} x{count}" for address, count in summary[location].items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
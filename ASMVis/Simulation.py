@@ -1,6 +1,10 @@
+from array import array
 from collections import defaultdict
+import operator
+import time
 import Grammar as grm
-import Visualizer as v
+import Instructions as ins
+from Timeline import Timeline, default_interval
 
 '''
 Author: Efren Haskell
@@ -8,46 +12,195 @@ Last Update: 4/8/2024
 Simulation class handles simulation of CPU and ASM semantic parsing
 '''
 
+default_max_steps: int = 100000
+register_min: int = -2 ** 63
+register_max: int = 2 ** 63 - 1
+comparisons = {"blt": operator.lt, "bgt": operator.gt, "bleq": operator.le, "bgeq": operator.ge, "beq": operator.eq, "bneq": operator.ne}
+
+
+def range_error(index: int) -> Exception:
+    """The error raised when the operation at index computes a value a signed 64-bit register cannot hold"""
+    return Exception(f"Error:\nLine {index+1} -> value out of 64-bit range")
+
+
+def checked(value: str, index: int) -> str:
+    """Returns a string mode value about to enter a register, raising range_error like the numeric registers
+    when it is a number a signed 64-bit register cannot hold; text that is not a number passes unchanged
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        return value
+    if not register_min <= number <= register_max:
+        raise range_error(index)
+    return value
+
+
+def runtime_message(e: Exception, index: int) -> str:
+    """One-line report of a runtime error raised by the operation at index
+    MiniASM errors already name their line, other exceptions are prefixed with it
+    """
+    text = str(e)
+    if text.startswith("Error:\n"):
+        return " ".join(text[len("Error:\n"):].split("\n"))
+    return f"Line {index+1} -> {type(e).__name__}: {text}"
+
+
+class StepResult:
+    """What one compiled step did, for front ends that apply deltas instead of re-reading machine state
+        - index: operation index that executed
+        - next_pc: operation index that executes next (the one after a halt, as simulate_step returns)
+        - changes: (location, address, old, new) of the value the step wrote, empty for control flow;
+          address is a register number or integer address key, old is None for addresses that held nothing
+        - taken: whether a branch or br jumped, None for other operations
+        - halted: whether the step executed a halt
+    """
+    __slots__ = ("index", "next_pc", "changes", "taken", "halted")
+
+    def __init__(self, index: int, next_pc: int, changes: list[tuple[str, int, int, int]], taken: bool, halted: bool):
+        self.index = index
+        self.next_pc = next_pc
+        self.changes = changes
+        self.taken = taken
+        self.halted = halted
+
+    def __repr__(self) -> str:
+        return f"StepResult(index={self.index}, next_pc={self.next_pc}, changes={self.changes}, taken={self.taken}, halted={self.halted})"
+
+
 class Simulation:
 
-    def __init__(self):
+    def __init__(self, numeric: bool = False):
         """The Simulation Constructor initializes the below variables:
+            - numeric: whether machine state lives only in the numeric registers, memory and disk
+              instead of the string history (strings are then produced by display_state)
             - history: stores all register, menu and disk values for every visualizer state
             - base_cache: stores all initialized presets
             - label_map: maps label name to line number
             - operation_log: stores a log of skeletons produced during first parse of MiniASM program
+            - targets: per operation, the operation index its branch label resolves to (-1 without a label),
+              filled by the resolve_targets pass, None until then
             - index_log: keeps track of prior indexes
-            - curr_line: currently unused
+            - curr_line: index the last run stopped at
             - cache_log: stores a log of all operations performed by MiniASM program
+            - record_undo: whether simulate_step appends to cache_log
+            - halted: whether the last run stopped on a halt instruction
+            - program: pre-decoded Instruction records compiled from operation_log, None until compiled
+            - registers, memory, disk: numeric machine state the compiled program runs on
+              registers is a fixed array('q') in numeric mode, memory and disk map int address -> int value
+            - timeline: checkpoints and delta log for seek, None until enable_timeline is called
+            - observers: callables notified after every compiled step (numeric simulate_step and run) as
+              observer(sim, index, op, target, next_index), target being the (location, address) op wrote or None
+              an observer returning a truthy value stops run after the step
+            - probes: callables notified before every compiled step as probe(sim, index, op), while the registers
+              still hold the values op reads (profiles, caches); discarded with the program, as profile counts are indexed by operation
+            - subscribers: callables receiving a StepResult after every compiled step, see subscribe
         """
+        self.numeric = numeric
         self.history = {
             "registers": defaultdict(str),
             "memory": defaultdict(str),
             "disk": defaultdict(str)
         }
         self.base_cache = {
-            "memory": defaultdict(str),
-            "disk": defaultdict(str)
+            "memory": {} if numeric else defaultdict(str),
+            "disk": {} if numeric else defaultdict(str)
         }
         self.label_map: defaultdict(str) = defaultdict()
         self.operation_log = [] # for storing skeletons
+        self.targets: list[int] = None
         self.index_log = [0]
         self.curr_line = 0
         self.cache_log = []
+        self.record_undo = True
+        self.halted = False
+        self.program: list[ins.Instruction] = None
+        self.registers = array('q', bytes(8 * ins.register_count))
+        self.memory: dict[int, int] = {}
+        self.disk: dict[int, int] = {}
+        self.timeline: Timeline = None
+        self.observers: list = []
+        self.probes: list = []
+        self.subscribers: list = []
 
     def set_base(self, location: str, address: str, data: str):
-        """Adds new preset to history and base cache"""
+        """Adds new preset to history and base cache
+        raises ValueError in numeric mode when the address or data is not a number
+        """
+        if self.numeric:
+            key, value = ins.address_key(address), int(data)
+            getattr(self, location)[key] = value
+            self.base_cache[location][key] = value
+            return
         self.history[location][address] = data
         self.base_cache[location][address] = data
 
 
     def remove_base(self, location: str, address: str):
         """Removes preset from history and base cache if it exists"""
+        if self.numeric:
+            try:
+                key = ins.address_key(address)
+            except ValueError:
+                return
+            getattr(self, location).pop(key, None)
+            self.base_cache[location].pop(key, None)
+            return
         if address in self.history[location]:
             self.history[location].pop(address)
             self.base_cache[location].pop(address)
 
 
+    def clear(self):
+        """Resets the machine state, presets and program, keeping attached observers and subscribers"""
+        observers, subscribers = self.observers, self.subscribers
+        self.__init__(self.numeric)
+        self.observers, self.subscribers = observers, subscribers
+
+
+    def clear_program(self):
+        """Discards the assembled program (labels, skeletons, compiled records, undo logs) but keeps machine state"""
+        self.label_map = defaultdict()
+        self.operation_log = []
+        self.targets = None
+        self.program = None
+        self.index_log = [0]
+        self.cache_log = []
+        self.timeline = None
+        self.probes = []
+
+
+    def load_program(self, label_map: dict[str, int], operation_log: list[tuple]):
+        """Replaces the assembled program with previously encoded labels and skeletons"""
+        self.clear_program()
+        self.label_map = defaultdict(None, label_map)
+        self.operation_log = list(operation_log)
+
+
+    def reset(self):
+        """Resets the machine state and program, restoring memory and disk to the presets in base_cache"""
+        base_cache = self.base_cache
+        self.clear()
+        self.base_cache = base_cache
+        if self.numeric:
+            self.memory = dict(base_cache["memory"])
+            self.disk = dict(base_cache["disk"])
+        else:
+            self.history["memory"] = base_cache["memory"]
+            self.history["disk"] = base_cache["disk"]
+
+
+    def display_state(self, location: str) -> dict[str, str]:
+        """Returns a location's contents as address -> value strings for display
+        In numeric mode this is the only place machine state is converted to strings
+        """
+        if not self.numeric:
+            return dict(self.history[location])
+        if location == "registers":
+            return {f"r{number}": str(value) for number, value in enumerate(self.registers)}
+        return {ins.address_name(key): str(value) for key, value in getattr(self, location).items()}
+
+
     def instruction_handle(self, instruction: str, tokens: list[str], types: list[str], offset: int):
         """skeleton encoder for instructions
         Instruction skeleton takes form: (instruction, address_mode, destination, source, destination value, source value)
@@ -61,12 +214,12 @@ class Simulation:
             source = tokens[4 + offset]
             source_type = types[4 + offset]
             if address_mode == "index":
-                source = (source, tokens[6] + offset)
+                source = (source, tokens[6 + offset])
         if instruction == "load" or instruction == "store":
             source_loc = "memory"
         else:
             source_loc = "disk"
-        if source_type == "reg" and address_mode != "relative":
+        if source_type == "reg" and address_mode != "relative" and address_mode != "index":
             source_loc = "registers"
         if instruction == "load" or instruction == "read":
             return (instruction, address_mode, "registers", source_loc, destination, source)
@@ -80,24 +233,53 @@ class Simulation:
         self.encode_skel(tokens, types, line_index+1, offset=1)
 
 
-    def encode_skel(self, tokens: list[str], types: list[str], line_index: int, offset: int = 0):
-        """handles control flow for skeleton encoding creation"""
-        token_count: int = len(tokens)
+    def make_skel(self, tokens: list[str], types: list[str], offset: int = 0) -> tuple:
+        """builds the skeleton of a parsed operation without recording it"""
         first_type: str = types[0+offset]
         if first_type in grm.instructions:
-            self.operation_log.append(self.instruction_handle(first_type, tokens, types, offset))
-        elif first_type == "label":
-            self.label_handle(first_type, tokens, types, line_index-1)
+            return self.instruction_handle(first_type, tokens, types, offset)
         elif first_type == "arithmetic":
-            self.operation_log.append((tokens[offset], tokens[1+offset], tokens[3+offset]))
+            return (tokens[offset], tokens[1+offset], tokens[3+offset])
         elif first_type == "branch":
-            self.operation_log.append((tokens[offset], tokens[1+offset], tokens[3+offset], tokens[5+offset]))
+            return (tokens[offset], tokens[1+offset], tokens[3+offset], tokens[5+offset])
         elif first_type == "br":
-            self.operation_log.append((first_type, tokens[1+offset]))
+            return (first_type, tokens[1+offset])
         elif first_type == "inc":
-            self.operation_log.append((first_type, tokens[1+offset]))
+            return (first_type, tokens[1+offset])
+        return (first_type, None)
+
+
+    def encode_skel(self, tokens: list[str], types: list[str], line_index: int, offset: int = 0):
+        """handles control flow for skeleton encoding creation"""
+        self.program = None
+        self.targets = None
+        if types[0+offset] == "label":
+            self.label_handle(types[0+offset], tokens, types, line_index-1)
         else:
-            self.operation_log.append((first_type, None))
+            self.operation_log.append(self.make_skel(tokens, types, offset))
+
+
+    def splice_program(self, first: int, last: int, operations: list[tuple], labels: dict[str, int], removed: list[str]):
+        """Replaces operation_log[first:last] with operations in place, shifting later label indexes to match
+        labels maps the labels defined by operations to their new indexes, removed lists the labels defined by the replaced range
+        Undo logs, timeline, targets and compiled records refer to the old program and are discarded; machine state is kept
+        raises Exception when one of operations branches to an undefined label, the labels of the rest being unchanged
+        """
+        shift: int = len(operations) - (last - first)
+        for label in removed:
+            self.label_map.pop(label, None)
+        if shift != 0:
+            shifted = {label: index + shift if index >= last else index for label, index in self.label_map.items()}
+            self.label_map.clear()
+            self.label_map.update(shifted)
+        self.label_map.update(labels)
+        self.operation_log[first:last] = operations
+        self.targets = None
+        self.program = None
+        self.index_log = [0]
+        self.cache_log = []
+        self.timeline = None
+        self.label_targets(operations, first)
 
 
     def make_log_string(self, index) -> list[str]:
@@ -122,6 +304,8 @@ class Simulation:
         """Reverts a visualizer step by undoing last action in cache_log
         Returns previous index
         """
+        if self.numeric:
+            return self.revert_numeric(index)
         cache_val = self.cache_log[index]
         instruction = self.operation_log[index][0]
         if cache_val != None:
@@ -135,10 +319,139 @@ class Simulation:
         return self.index_log[-1]
 
 
+    def revert_numeric(self, index) -> int:
+        """Numeric mode revert_step, restoring the value recorded before the operation at index ran
+        With a timeline, steps back through seek instead: the state returns to before the previous step
+        and its index is returned, so re-simulating that index lands on the previous visualizer state
+        """
+        if self.timeline is not None:
+            return self.seek(self.timeline.step - 2)
+        cache_val = self.cache_log[index]
+        if cache_val != None:
+            old, location, key = cache_val
+            if location == "registers":
+                self.registers[key] = old
+            elif old is None:
+                getattr(self, location).pop(key, None)
+            else:
+                getattr(self, location)[key] = old
+        if len(self.index_log) > 1:
+            self.index_log.pop()
+        return self.index_log[-1]
+
+
+    def simulate_numeric(self, index) -> int:
+        """Numeric mode simulate_step, running the compiled operation at index
+        Keeps the overwritten value in cache_log as (old value, location, address),
+        or in the timeline delta log when a timeline is enabled
+        """
+        program = self.program
+        if program is None:
+            program = self.compile()
+        timeline = self.timeline
+        if timeline is not None:
+            timeline.before_step(self, index)
+        op = program[index]
+        for probe in self.probes:
+            probe(self, index, op)
+        target = ins.destination(self, op)
+        old = self.value_at(target) if target is not None else None
+        subscribers = self.subscribers
+        taken = self.branch_taken(op) if subscribers else None
+        try:
+            next_index = op.handler(self, op, index)
+        except OverflowError:
+            raise range_error(index) from None
+        halted = next_index < 0
+        if halted:
+            next_index = index + 1
+        for observer in self.observers:
+            observer(self, index, op, target, next_index)
+        if subscribers:
+            self.notify(index, target, old, taken, next_index, halted)
+        if timeline is not None:
+            timeline.record(index, target, old, next_index)
+        elif self.record_undo and len(self.cache_log) <= index:
+            self.cache_log.append(None if target is None else (old, target[0], target[1]))
+        return next_index
+
+
+    def value_at(self, key: tuple[str, int]) -> int:
+        """Returns the numeric value at a (location, address) key, None for memory and disk addresses holding nothing"""
+        location, address = key
+        if location == "registers":
+            return self.registers[address]
+        return getattr(self, location).get(address)
+
+
+    def branch_taken(self, op: ins.Instruction) -> bool:
+        """Whether op jumps when executed in the current state, None when op is not a branch or br"""
+        if op.opcode == ins.opcodes["branch"]:
+            return op.compare(self.registers[op.register], self.registers[op.operand])
+        elif op.opcode == ins.opcodes["br"]:
+            return True
+        return None
+
+
+    def subscribe(self, callback) -> object:
+        """Registers callback to receive a StepResult after every compiled step (numeric simulate_step, seek and run)
+        Subscribers outlive program reloads and clear, like observers; returns callback so it can be unsubscribed
+        """
+        self.subscribers.append(callback)
+        return callback
+
+
+    def unsubscribe(self, callback):
+        """Stops sending StepResults to callback"""
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+
+    def notify(self, index: int, target: tuple[str, int], old: int, taken: bool, next_index: int, halted: bool):
+        """Sends the StepResult of the step that just executed the operation at index to every subscriber"""
+        changes = [] if target is None else [(target[0], target[1], old, self.value_at(target))]
+        result = StepResult(index, next_index, changes, taken, halted)
+        for subscriber in self.subscribers:
+            subscriber(result)
+
+
+    def enable_timeline(self, interval: int = default_interval):
+        """Starts recording a timeline from the current state as step 0, checkpointing every interval steps
+        raises Exception outside numeric mode
+        """
+        if not self.numeric:
+            raise Exception("Error:\nTimelines require a numeric Simulation")
+        if self.program is None:
+            self.compile()
+        self.timeline = Timeline(interval)
+        self.timeline.before_step(self, 0)
+
+
+    def seek(self, step: int) -> int:
+        """Moves the machine to the state after step executed steps
+        Steps within the current checkpoint segment are undone from the delta log, anything else
+        restores the nearest earlier checkpoint and replays forward, so a seek replays at most one
+        checkpoint spacing of steps. Stops early if the program halts before step
+        Returns the index of the next operation to execute
+        """
+        timeline = self.timeline
+        step = max(step, 0)
+        if timeline.segment_start <= step <= timeline.step:
+            while timeline.step > step:
+                timeline.undo(self)
+        else:
+            timeline.restore(self, timeline.nearest(step))
+        while timeline.step < step and not timeline.finished(self.program):
+            self.simulate_numeric(timeline.pc)
+        return timeline.pc
+
+
     def simulate_step(self, index) -> int:
         """Changes history values based on MiniASM operation
         Keeps track of state changes in cache_log
         """
+        if self.numeric:
+            return self.simulate_numeric(index)
         skeleton = self.operation_log[index]
         instruction = skeleton[0]
         if instruction in grm.instructions:
@@ -146,69 +459,69 @@ class Simulation:
             address_mode: str = skeleton[1]
             changed_val: str = skeleton[4]
             if address_mode == "direct":
-                self.history[skeleton[2]][skeleton[4]] = self.history[skeleton[3]][skeleton[5]]
+                self.history[skeleton[2]][skeleton[4]] = checked(self.history[skeleton[3]][skeleton[5]], index)
             elif address_mode == "immediate":
-                self.history[skeleton[2]][skeleton[4]] = skeleton[5]
+                self.history[skeleton[2]][skeleton[4]] = checked(skeleton[5], index)
             elif address_mode == "index":
                 if instruction == "load" or instruction == "read":
-                    self.history[skeleton[2]][skeleton[4]] = self.history[skeleton[3]][str(int(skeleton[5][0]) + int(skeleton[5][1]))]
+                    self.history[skeleton[2]][skeleton[4]] = checked(self.history[skeleton[3]][self.index_address(skeleton[5])], index)
                 else:
-                    changed_val = str(int(skeleton[4][0]) + int(skeleton[4][1]))
-                    self.history[skeleton[2]][str(int(skeleton[4][0]) + int(skeleton[4][1]))] = self.history[skeleton[3]][skeleton[5]]
+                    changed_val = self.index_address(skeleton[4])
+                    val = changed_val
+                    self.history[skeleton[2]][val] = self.history[skeleton[3]][skeleton[5]]
             elif address_mode == "relative":
                 if instruction == "load":
                     relative_address = skeleton[5]
-                    val = "x"
-                    if grm.get_type(relative_address) == "reg":
+                    if relative_address in grm.registers:
                         relative_address = self.history["registers"][relative_address]
-                    num_val = int(relative_address) + 4 * index
-                    if num_val > 0:
-                        val += " + " + num_val
+                    val = ins.relative_name(int(relative_address) + 4 * index)
                     changed_val = val
-                    self.history[skeleton[2]][skeleton[4]] = self.history[skeleton[3]][val]
+                    self.history[skeleton[2]][skeleton[4]] = checked(self.history[skeleton[3]][val], index)
                 else:
                     relative_address = skeleton[4]
-                    val = "x"
-                    if grm.get_type(relative_address) == "reg":
+                    if relative_address in grm.registers:
                         relative_address = self.history["registers"][relative_address]
-                    num_val = int(relative_address) + 4 * index
-                    if num_val > 0:
-                        val += "+" + str(num_val)
+                    val = ins.relative_name(int(relative_address) + 4 * index)
                     changed_val = val
                     self.history[skeleton[2]][val] = self.history["registers"][skeleton[5]]
             else:
-                self.history[skeleton[2]][val] = self.history["memory"][self.history[skeleton[3]][skeleton[5]]]
-            if len(self.cache_log) <= index:
+                self.history[skeleton[2]][val] = checked(self.history["memory"][self.history[skeleton[3]][skeleton[5]]], index)
+            if self.record_undo and len(self.cache_log) <= index:
                 self.cache_log.append((self.history[skeleton[2]][val], skeleton[2], changed_val))
         elif instruction in grm.branches:
-            branch_type = instruction
-            goto = self.label_map[skeleton[3]+":"]
-            if len(self.cache_log) <= index:
+            if self.targets is None:
+                self.resolve_targets()
+            goto = self.targets[index]
+            if self.record_undo and len(self.cache_log) <= index:
                 self.cache_log.append(None)
-            if branch_type == "blt" and skeleton[1] < skeleton[2] or branch_type == "bgt" and skeleton[1] > skeleton[2] or branch_type == "bleq" and skeleton[1] <= skeleton[2] or branch_type == "bgeq" and skeleton[1] >= skeleton[2]:
+            if comparisons[instruction](int(self.history["registers"][skeleton[1]]), int(self.history["registers"][skeleton[2]])):
                 return goto
         elif instruction == "br":
-            if len(self.cache_log) <= index:
+            if self.record_undo and len(self.cache_log) <= index:
                 self.cache_log.append(None)
-            return self.label_map[skeleton[1]+":"]
+            if self.targets is None:
+                self.resolve_targets()
+            return self.targets[index]
         elif instruction in grm.arithmetic:
             change_val: str = self.history["registers"][skeleton[1]]
+            registers = self.history["registers"]
             if instruction == "add":
-                self.history["registers"][skeleton[1]] = str(int(self.history["registers"][skeleton[1]]) + int(self.history["registers"][skeleton[2]]))
+                result = int(registers[skeleton[1]]) + int(registers[skeleton[2]])
             elif instruction == "sub":
-                self.history["registers"][skeleton[1]] = str(int(self.history["registers"][skeleton[1]]) - int(self.history["registers"][skeleton[2]]))
+                result = int(registers[skeleton[1]]) - int(registers[skeleton[2]])
             elif instruction == "div":
-                self.history["registers"][skeleton[1]] = str(int(self.history["registers"][skeleton[1]]) / int(self.history["registers"][skeleton[2]]))
-            elif instruction == "mul":
-                self.history["registers"][skeleton[1]] = str(int(self.history["registers"][skeleton[1]]) * int(self.history["registers"][skeleton[2]]))
-            if len(self.cache_log) <= index:
+                result = ins.truncate_div(int(registers[skeleton[1]]), int(registers[skeleton[2]]))
+            else:
+                result = int(registers[skeleton[1]]) * int(registers[skeleton[2]])
+            registers[skeleton[1]] = checked(str(result), index)
+            if self.record_undo and len(self.cache_log) <= index:
                 self.cache_log.append((change_val, "registers", skeleton[1]))
         elif instruction == "inc":
-            if len(self.cache_log) <= index:
+            if self.record_undo and len(self.cache_log) <= index:
                 self.cache_log.append((self.history["registers"][skeleton[1]], "registers", skeleton[1]))
-            self.history["registers"][skeleton[1]] = str(int(self.history["registers"][skeleton[1]]) + 1)
+            self.history["registers"][skeleton[1]] = checked(str(int(self.history["registers"][skeleton[1]]) + 1), index)
         else:
-            if len(self.cache_log) <= index:
+            if self.record_undo and len(self.cache_log) <= index:
                 self.cache_log.append(None)
         return index+1
 
@@ -217,3 +530,228 @@ class Simulation:
         """Manual index logger for accurate determination of previous steps"""
         if self.index_log[-1] != index:
             self.index_log.append(index)
+
+
+    def index_address(self, pair: tuple[str, str]) -> str:
+        """Computes the address of an index operand [base, register] from history values"""
+        base, offset = pair
+        if base in grm.registers:
+            base = self.history["registers"][base]
+        return str(int(base) + int(self.history["registers"][offset]))
+
+
+    def compile_instruction(self, skeleton: tuple, index: int) -> ins.Instruction:
+        """Pre-decodes a load, store, read or write skeleton into an Instruction"""
+        instruction, address_mode = skeleton[0], skeleton[1]
+        if instruction == "load" or instruction == "read":
+            kind, location = "load", skeleton[3]
+            register, address = ins.register_index(skeleton[4]), skeleton[5]
+        else:
+            kind, location = "store", skeleton[2]
+            register, address = ins.register_index(skeleton[5]), skeleton[4]
+        if address_mode == "immediate":
+            return ins.Instruction("load_immediate", register, value=int(address), mode=address_mode)
+        elif address_mode == "direct":
+            if location == "registers":
+                if kind == "load":
+                    return ins.Instruction("move", register, ins.register_index(address), mode=address_mode)
+                return ins.Instruction("move", ins.register_index(address), register, mode=address_mode)
+            return ins.Instruction(f"{kind}_{location}", register, value=int(address), location=location, mode=address_mode)
+        elif address_mode == "relative":
+            pc = ins.relative_base + 4 * index
+            if address.lower() in grm.registers:
+                return ins.Instruction(f"{kind}_{location}_offset", register, ins.register_index(address), value=pc, location=location, mode=address_mode)
+            return ins.Instruction(f"{kind}_{location}", register, value=pc + int(address), location=location, mode=address_mode)
+        elif address_mode == "index":
+            base, offset = address
+            if base.lower() in grm.registers:
+                return ins.Instruction(f"{kind}_{location}_pair", register, ins.register_index(offset), base=ins.register_index(base), location=location, mode=address_mode)
+            return ins.Instruction(f"{kind}_{location}_offset", register, ins.register_index(offset), value=int(base), location=location, mode=address_mode)
+        else:
+            if address.lower() in grm.registers:
+                return ins.Instruction("load_memory_offset", register, ins.register_index(address), location="memory", mode=address_mode)
+            return ins.Instruction("load_indirect", register, value=int(address), location="memory", mode=address_mode)
+
+
+    def label_targets(self, operations: list[tuple], first: int = 0) -> list[int]:
+        """Resolves the branch label of every operation in operations, the first of them being operation first
+        Labels match regardless of case, as the parser lower-cases every label it reads
+        Returns the operation index each label names, -1 for operations without a label operand
+        raises Exception at the first branch to a label that is never defined
+        """
+        label_map = {label.lower(): index for label, index in self.label_map.items()}
+        targets: list[int] = []
+        for index, skeleton in enumerate(operations, first):
+            instruction = skeleton[0].lower()
+            if instruction in grm.branches:
+                label = skeleton[3]
+            elif instruction == "br":
+                label = skeleton[1]
+            else:
+                targets.append(-1)
+                continue
+            target = label_map.get(label.lower() + ":")
+            if target is None:
+                raise Exception(f"Error:\nLine {index+1} -> Branch target \"{label}\" is not a defined label")
+            targets.append(target)
+        return targets
+
+
+    def resolve_targets(self) -> list[int]:
+        """Second assembly pass, run once every label is known: resolves the label of every branch and br
+        to the operation index it names, so executing a branch never looks a label up
+        Stores and returns targets
+        raises Exception at the first branch to a label that is never defined
+        """
+        self.targets = self.label_targets(self.operation_log)
+        return self.targets
+
+
+    def compile(self) -> list[ins.Instruction]:
+        """Compiles operation_log into pre-decoded Instruction records stored in program
+        Opcode strings become integer opcodes with a handler, operands become integers
+        and branch labels become the operation indexes resolve_targets found
+        """
+        targets = self.targets if self.targets is not None else self.resolve_targets()
+        program: list[ins.Instruction] = []
+        for index, skeleton in enumerate(self.operation_log):
+            instruction = skeleton[0].lower()
+            if instruction in grm.instructions:
+                program.append(self.compile_instruction(skeleton, index))
+            elif instruction in grm.branches:
+                program.append(ins.Instruction("branch", ins.register_index(skeleton[1]), ins.register_index(skeleton[2]),
+                                               target=targets[index], compare=comparisons[instruction]))
+            elif instruction == "br":
+                program.append(ins.Instruction("br", target=targets[index]))
+            elif instruction in grm.arithmetic:
+                program.append(ins.Instruction(instruction, ins.register_index(skeleton[1]), ins.register_index(skeleton[2])))
+            elif instruction == "inc":
+                program.append(ins.Instruction("inc", ins.register_index(skeleton[1])))
+            else:
+                program.append(ins.Instruction(instruction))
+        self.program = program
+        return program
+
+
+    def load_machine(self):
+        """Converts history into the numeric registers, memory and disk used by the compiled program
+        Addresses that are not numeric or relative cannot be reached by a program and are left out
+        raises Exception when a reachable value is not a number or a register value is out of 64-bit range
+        """
+        self.registers = array('q', bytes(8 * ins.register_count))
+        for name, value in self.history["registers"].items():
+            if value != "":
+                try:
+                    self.registers[ins.register_index(name)] = int(value)
+                except OverflowError:
+                    raise Exception(f"Error:\nregisters value \"{value}\" at \"{name}\" is out of 64-bit range") from None
+        for location in ("memory", "disk"):
+            state: dict[int, int] = {}
+            for name, value in self.history[location].items():
+                try:
+                    key = ins.address_key(name)
+                except (TypeError, ValueError):
+                    continue
+                if value != "":
+                    try:
+                        state[key] = int(value)
+                    except ValueError:
+                        raise Exception(f"Error:\n{location} value \"{value}\" at address \"{name}\" is not a number")
+            setattr(self, location, state)
+
+
+    def store_machine(self):
+        """Writes the numeric registers, memory and disk back into history"""
+        registers = self.history["registers"]
+        for number, value in enumerate(self.registers):
+            name = f"r{number}"
+            if value != 0 or name in registers:
+                registers[name] = str(value)
+        for location in ("memory", "disk"):
+            history = self.history[location]
+            for key, value in getattr(self, location).items():
+                history[ins.address_name(key)] = str(value)
+
+
+    def run(self, index: int = 0, max_steps: int = default_max_steps, record_undo: bool = False) -> tuple[int, float]:
+        """Runs the program from index until a halt instruction executes or max_steps steps have run
+        Without record_undo the compiled program runs on the numeric machine state (converted
+        from and back to history outside numeric mode), otherwise simulate_step is called
+        in a loop so cache_log is kept for undo
+        Leaves the index the run stopped at in curr_line (the halt, the failing operation,
+        or the next operation when the step budget runs out) and sets halted
+        Observers are notified after every step and may stop the run by returning a truthy value, in which
+        case curr_line is the next operation; subscribers receive a StepResult for every step
+        Without any observers, probes or subscribers, the handler loop runs unobserved
+        Returns the executed step count and the wall time in seconds
+        """
+        if record_undo:
+            return self.interpret(index, max_steps)
+        program = self.program
+        if program is None:
+            program = self.compile()
+        if not self.numeric:
+            self.load_machine()
+        self.halted = False
+        steps: int = 0
+        start = time.perf_counter()
+        observers = self.observers
+        probes = self.probes
+        subscribers = self.subscribers
+        try:
+            if len(observers) == 0 and len(probes) == 0 and len(subscribers) == 0:
+                for steps in range(1, max_steps + 1):
+                    op = program[index]
+                    index = op.handler(self, op, index)
+                    if index < 0:
+                        self.halted = True
+                        index = ins.halted - index
+                        break
+            else:
+                destination = ins.destination
+                for steps in range(1, max_steps + 1):
+                    op = program[index]
+                    for probe in probes:
+                        probe(self, index, op)
+                    target = destination(self, op)
+                    if subscribers:
+                        old = self.value_at(target) if target is not None else None
+                        taken = self.branch_taken(op)
+                    next_index = op.handler(self, op, index)
+                    stop = False
+                    for observer in observers:
+                        if observer(self, index, op, target, index + 1 if next_index < 0 else next_index):
+                            stop = True
+                    if subscribers:
+                        self.notify(index, target, old, taken, index + 1 if next_index < 0 else next_index, next_index < 0)
+                    if next_index < 0:
+                        self.halted = True
+                        break
+                    index = next_index
+                    if stop:
+                        break
+        except OverflowError:
+            raise range_error(index) from None
+        finally:
+            self.curr_line = index
+            if not self.numeric:
+                self.store_machine()
+        return steps, time.perf_counter() - start
+
+
+    def interpret(self, index: int, max_steps: int) -> tuple[int, float]:
+        """Runs operation_log through simulate_step, recording undo information in cache_log"""
+        operation_log = self.operation_log
+        self.halted = False
+        steps: int = 0
+        start = time.perf_counter()
+        try:
+            for steps in range(1, max_steps + 1):
+                next_index = self.simulate_step(index)
+                if operation_log[index][0] == "halt":
+                    self.halted = True
+                    break
+                index = next_index
+        finally:
+            self.curr_line = index
+        return steps, time.perf_counter() - start
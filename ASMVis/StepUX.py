@@ -1,9 +1,18 @@
 from tkinter import *
 from tkinter import filedialog, PhotoImage
+from array import array
 from Simulation import *
+from Timeline import location_names
+import Instructions as ins
 from os.path import exists
+import sys
+import time
 import Visualizer as v
 import Grammar as grm
+from Breakpoints import Breakpoints
+from Profile import Profile
+from CostModel import CostModel
+from Cache import CacheHierarchy
 
 """
 Author: Efren Haskell
@@ -12,22 +21,50 @@ StepUX class creates a UI for Assembly visualization and Syntax checking for Bra
 """
 
 
-interface = Tk()
-interface.title("CS131 Assembly Visualizer")
-interface.geometry("440x400")
-interface.resizable(False, False)
+home_geometry: str = "440x400"
+step_geometry: str = "980x640" # the step view needs room for the heatmap, the panes and the play and breakpoint controls
+interface: Tk = None # main window, created by open_interface on first use so importing this module opens no window
 bg_color = "#F3FCF6"
-interface['background'] = bg_color
-emul = Simulation()
-make_preset = Tk()
-make_preset['background'] = bg_color
-make_preset.geometry("400x440")
-make_preset.resizable(False, False)
-make_preset.withdraw()
-preset_frame = LabelFrame(make_preset)
-scrollbar = Scrollbar(preset_frame)
-scrollbar.pack(side=RIGHT, fill=Y)
-preset_list = Listbox(preset_frame, yscrollcommand=scrollbar.set)
+emul = Simulation(numeric=True)
+make_preset: Tk = None # hidden preset editor window, created by open_preset_editor the first time a preset is edited
+preset_frame: LabelFrame = None
+scrollbar: Scrollbar = None
+preset_list: Listbox = None
+step_view: dict = {} # widgets, panes and position of the step view, kept alive across steps while it is shown
+frame_ms: int = 33 # play mode redraws at most once per frame
+max_speed_exponent: int = 5 # the speed slider goes up to 10 ** max_speed_exponent steps per second
+shown_errors: int = 6 # syntax errors listed by the syntax checker, the rest are counted
+breakpoints = Breakpoints() # line and conditional breakpoints of the loaded program, checked after every step
+
+
+def open_interface() -> Tk:
+    """The open_interface method creates and styles the main window the first time it is called and returns it"""
+    global interface
+    if interface is None:
+        interface = Tk()
+        interface.title("CS131 Assembly Visualizer")
+        interface.geometry(home_geometry)
+        interface.resizable(False, False)
+        interface['background'] = bg_color
+        interface.protocol("WM_DELETE_WINDOW", close_all)
+    return interface
+
+
+def open_preset_editor() -> Tk:
+    """The open_preset_editor method creates the hidden preset editor window and its preset list the first time it is called and returns it"""
+    global make_preset, preset_frame, scrollbar, preset_list
+    if make_preset is None:
+        make_preset = Tk()
+        make_preset['background'] = bg_color
+        make_preset.geometry("400x440")
+        make_preset.resizable(False, False)
+        make_preset.withdraw()
+        make_preset.protocol("WM_DELETE_WINDOW", editor_close)
+        preset_frame = LabelFrame(make_preset)
+        scrollbar = Scrollbar(preset_frame)
+        scrollbar.pack(side=RIGHT, fill=Y)
+        preset_list = Listbox(preset_frame, yscrollcommand=scrollbar.set)
+    return make_preset
 
 
 def editor_close():
@@ -35,16 +72,14 @@ def editor_close():
 
 
 def close_all():
-    make_preset.destroy()
+    if make_preset is not None:
+        make_preset.destroy()
     interface.destroy()
 
 
-make_preset.protocol("WM_DELETE_WINDOW", editor_close)
-interface.protocol("WM_DELETE_WINDOW", close_all)
-
-
 def home():
-    """The home method initializes GUI elements and styling for home page"""
+    """The home method initializes GUI elements and styling for home page, creating the main window on first use"""
+    open_interface()
     page_elements = []
     for i in range(3):
         page_elements.append(Label(interface, bg=bg_color))
@@ -160,7 +195,7 @@ def list_presets(preset_type):
     """The list_presets method initializes a list box to display memory and disk preset values"""
     preset_list.delete(0, END)
     presets.deiconify()
-    for key, val in emul.history[preset_type].items():
+    for key, val in emul.display_state(preset_type).items():
         preset_list.insert(END, preset_type + ": " + key+"->"+val)
     preset_list.pack(fill=BOTH)
     scrollbar.config(command=preset_list.yview)
@@ -173,6 +208,7 @@ def make_new_preset(preset_type):
     Preset elements are identifiable by an address parameter
     Elements are saved as address, data pairs
     """
+    open_preset_editor()
     make_preset.title(f"Make {preset_type} Preset")
     make_preset.deiconify()
     for i in range(2):
@@ -188,7 +224,9 @@ def make_new_preset(preset_type):
     Label(labelFrame1, text="Value:", bg="white").pack(side="left", padx=2, pady=2)
     e1 = Entry(labelFrame1)
     e1.pack(side="left", padx=2, pady=2)
-    Button(make_preset, text="Set preset", bg="white", command=lambda params=(preset_type,e,e1): create(params)).pack(anchor="nw", padx=15, pady=2)
+    status = Label(make_preset, text="", font=('Courier', 9), bg=bg_color, justify="left")
+    Button(make_preset, text="Set preset", bg="white", command=lambda params=(preset_type,e,e1,status): create(params)).pack(anchor="nw", padx=15, pady=2)
+    status.pack(anchor="nw", padx=15)
     Label(make_preset, bg=bg_color).pack()
     labelFrame2.pack(anchor="w", padx=15)
     Label(labelFrame2, text="Address:", bg="white").pack(side="left", padx=2, pady=2)
@@ -205,15 +243,24 @@ def make_new_preset(preset_type):
 def refresh_history(preset_type):
     """The refresh_history method clears the preset list-box and refills it with the simulation base history values"""
     preset_list.delete(0,END)
-    for key, val in emul.history[preset_type].items():
+    for key, val in emul.display_state(preset_type).items():
         preset_list.insert(END, preset_type + ": " + key+"->"+val)
 
 def create(params):
-    """The create method handles preset creation"""
+    """The create method handles preset creation, reporting presets that are not set in the editor's status label"""
     address: str = params[1].get()
     data: str = params[2].get()
     location: str = params[0]
-    emul.set_base(location, address, data)
+    status = params[3]
+    try:
+        # presets must be numeric addresses (or x+offset) holding values a 64-bit register can load
+        if not register_min <= int(data) <= register_max:
+            raise ValueError
+        emul.set_base(location, address, data)
+    except ValueError:
+        status.config(text=f"Preset not set: \"{address}\" must be a number or x+offset\nand \"{data}\" a signed 64-bit number")
+        return
+    status.config(text=f"Set {location} {address} -> {data}")
     refresh_history(location)
     params[1].delete(0,END)
     params[2].delete(0,END)
@@ -242,7 +289,7 @@ def set_up():
     page_elements.append(Button(labelFrame, text="Add memory presets", font=('Courier', 11), command=lambda: make_new_preset("memory"), bg="white"))
     page_elements.append(Label(labelFrame, font=('Courier', 11), bg="white"))
     page_elements.append(Label(labelFrame, text="Disk Presets:", font=('Courier', 11), bg="white"))
-    page_elements.append(Button(labelFrame, text="Add disk presets", font=('Courier', 11), command=lambda: make_new_preset("memory"), bg="white"))
+    page_elements.append(Button(labelFrame, text="Add disk presets", font=('Courier', 11), command=lambda: make_new_preset("disk"), bg="white"))
     page_elements.append(Label(labelFrame, font=('Courier', 11), bg="white"))
     for element in page_elements:
         element.pack()
@@ -258,7 +305,10 @@ def set_up():
 
 
 def syntax_checker():
-    """The syntax_checker method initializes a window displaying the result of a syntax check run on file input"""
+    """The syntax_checker method initializes a window displaying the result of a syntax check run on file input
+    The file is assembled through the assembly cache, so unchanged valid files are not parsed again
+    When it has errors, every one of them is found in one more pass and the first shown_errors of them are listed
+    """
     page_elements = []
     for i in range(3):
         page_elements.append(Label(interface, bg=bg_color))
@@ -268,119 +318,454 @@ def syntax_checker():
     page_elements.append(Label(labelFrame, bg="white"))
     try:
         message = v.start(emul)[0]
+        errors = [] if message == v.success_message else v.diagnostics()
+        if len(errors) > 0:
+            message = "\n\n".join(str(error) for error in errors[:shown_errors])
+        if len(errors) > shown_errors:
+            message += f"\n\n... and {len(errors) - shown_errors} more errors"
     except Exception as e:
-        message = e
-    page_elements.append(Label(labelFrame, text=message, bg="white", font=('Courier', 12)))
+        errors, message = [], e
+    page_elements.append(Label(labelFrame, text=message, bg="white", font=('Courier', 12 if len(errors) < 2 else 9), justify="left"))
     page_elements.append(Label(interface, bg=bg_color))
     page_elements.append(Button(interface, text="Back", font=('Courier', 12), bg="white", command=lambda params=("option_page", page_elements): redirect(params)))
     for element in page_elements:
         element.pack()
 
 
+def build_step_view(token_sets: list[list[str]], length: int):
+    """The build_step_view method creates the step view widgets once per visualizer session
+    display_step then only reconfigures them, so stepping never destroys or recreates widgets
+    """
+    page_elements = []
+    title = Label(interface, text="ASM Visual", font=('Courier', 14), bg=bg_color)
+    title.pack(anchor="nw", padx=5, pady=5)
+    subtitle = Label(interface, text="", font=('Courier', 13), bg=bg_color)
+    subtitle.pack(anchor="nw", padx=5, pady=5)
+    labelFrame1 = LabelFrame(interface, bg="white")
+    labelFrame1.pack(side="left", padx=10, pady=10)
+    labelFrame2 = LabelFrame(interface, bg="white")
+    labelFrame2.pack(side="right", padx=10, pady=10)
+    labelFrame3 = LabelFrame(interface, bg="white")
+    labelFrame3.pack(side="right", padx=10, pady=10)
+    profile, cost_model, caches = profile_program()
+    heatmap = build_heatmap(labelFrame3, token_sets, profile, cost_model, caches)
+    page_elements.append(Label(labelFrame1, text="Element Breakdown:", font=('Courier', 10), bg="white"))
+    token_label = Label(labelFrame1, text="", font=('Courier', 8), bg="white")
+    page_elements.append(token_label)
+    log_labels = [Label(labelFrame1, text="", bg="white", width=42, font=('Courier', 8)) for i in range(5)]
+    page_elements.extend(log_labels)
+    back_button = Button(labelFrame1, font=('Courier', 10), text="< Back", bg="white", command=back_step)
+    next_button = Button(labelFrame1, font=('Courier', 10), text="Next >", bg="white", command=next_step)
+    page_elements.append(back_button)
+    page_elements.append(next_button)
+    jump_frame = Frame(labelFrame1, bg="white")
+    jump_entry = Entry(jump_frame, width=8, font=('Courier', 10))
+    jump_entry.pack(side="left", padx=2)
+    Button(jump_frame, font=('Courier', 10), text="Go to step", bg="white", command=lambda: jump_step(jump_entry)).pack(side="left")
+    page_elements.append(jump_frame)
+    play_frame = Frame(labelFrame1, bg="white")
+    play_button = Button(play_frame, font=('Courier', 10), text="Play", bg="white", width=5, command=toggle_play)
+    play_button.pack(side="left", padx=2)
+    speed_label = Label(play_frame, text=f"{steps_per_second(1):,} steps/s", font=('Courier', 8), bg="white", width=16)
+    speed_scale = Scale(play_frame, from_=0, to=max_speed_exponent, resolution=0.1, orient=HORIZONTAL, showvalue=0, bg="white",
+                        command=lambda value: speed_label.config(text=f"{steps_per_second(value):,} steps/s"))
+    speed_scale.set(1)
+    speed_scale.pack(side="left", padx=2)
+    speed_label.pack(side="left")
+    page_elements.append(play_frame)
+    break_frame = Frame(labelFrame1, bg="white")
+    break_entry = Entry(break_frame, width=16, font=('Courier', 10))
+    break_entry.pack(side="left", padx=2)
+    Button(break_frame, font=('Courier', 10), text="Add breakpoint", bg="white", command=lambda: add_breakpoint(break_entry)).pack(side="left")
+    page_elements.append(break_frame)
+    list_frame = Frame(labelFrame1, bg="white")
+    break_list = Listbox(list_frame, width=24, height=3, font=('Courier', 8))
+    break_list.pack(side="left", padx=2)
+    Button(list_frame, font=('Courier', 10), text="Remove", bg="white", command=remove_breakpoint).pack(side="left", anchor="n")
+    Button(list_frame, font=('Courier', 10), text="Run to breakpoint", bg="white", command=run_until).pack(side="left", anchor="n")
+    page_elements.append(list_frame)
+    break_status = Label(labelFrame1, text="", font=('Courier', 8), bg="white", justify="left")
+    page_elements.append(break_status)
+    page_elements.append(Button(labelFrame1, font=('Courier', 10), text="Back to Options", bg="white", command=leave_step_view))
+    panes = {}
+    for location, text in (("registers", "Registers:"), ("disk", "Disk:"), ("memory", "Memory:")):
+        page_elements.append(Label(labelFrame2, text=text, font=('Courier', 10), bg="white"))
+        frame = LabelFrame(labelFrame2, bg="white", width=10, height=2)
+        scroll = Scrollbar(frame, orient="vertical")
+        pane = Listbox(frame, yscrollcommand=scroll.set, width=10, height=3)
+        scroll.config(command=pane.yview)
+        scroll.pack(side="right", fill="y")
+        page_elements.append(frame)
+        page_elements.append(pane)
+        panes[location] = (pane, {}, {}, [])
+    for element in page_elements:
+        element.pack(anchor="w", padx=2, pady=2)
+    page_elements.extend((title, subtitle, labelFrame1, labelFrame2, labelFrame3))
+    step_view.update(token_sets=token_sets, length=length, index=0, next_index=0, elements=page_elements, subtitle=subtitle,
+                     token_label=token_label, log_labels=log_labels, back_button=back_button, next_button=next_button,
+                     panes=panes, changed=set(), full_refresh=True, play_button=play_button, speed_scale=speed_scale, playing=None,
+                     until=False, break_list=break_list, break_status=break_status, heatmap=heatmap,
+                     cost_model=cost_model, caches=caches)
+    emul.subscribe(record_change)
+    emul.observers.append(breakpoints)
+    open_interface().geometry(step_geometry)
+    refresh_breakpoints()
+
+
+def profile_program() -> tuple[Profile, CostModel, CacheHierarchy]:
+    """The profile_program method runs the loaded program once on a separate Simulation, from the state the step view starts in
+    Returns its profile, cost totals and default caches with their per-step log, counting up to a runtime error or the default step budget when the program stops there
+    """
+    sim = Simulation(numeric=True)
+    sim.registers = array('q', emul.registers)
+    sim.memory = dict(emul.memory)
+    sim.disk = dict(emul.disk)
+    sim.load_program(dict(emul.label_map), emul.operation_log)
+    profile = Profile().attach(sim)
+    cost_model = CostModel().attach(sim)
+    caches = CacheHierarchy.from_settings(keep_log=True).attach(sim)
+    try:
+        sim.run()
+    except Exception:
+        pass
+    return profile, cost_model, caches
+
+
+def heat_color(heat: float) -> str:
+    """Shades a heatmap row from white (never executed) to red (the most executed line)"""
+    fade = round(255 - 175 * heat)
+    return f"#FF{fade:02X}{fade:02X}"
+
+
+def build_heatmap(frame, token_sets: list[list[str]], profile: Profile, cost_model: CostModel, caches: CacheHierarchy):
+    """The build_heatmap method lists every program line beside its execution count in a full run, shaded by heat
+    The list is filled once; draw_step only moves the selection to the line being shown
+    """
+    Label(frame, text=f"Source heatmap ({profile.steps():,} steps):", font=('Courier', 10), bg="white").pack(anchor="w", padx=2, pady=2)
+    Label(frame, text=f"Full run: {cost_model.cycles_total:,} cycles, {cost_model.memory_total:,} memory and {cost_model.disk_total:,} disk words",
+          font=('Courier', 8), bg="white").pack(anchor="w", padx=2)
+    rates = ", ".join(f"{location} {stats['hit_rate']:.0%} of {stats['hits'] + stats['misses']:,}" for location, stats in caches.stats().items())
+    Label(frame, text=f"Cache hits: {rates}", font=('Courier', 8), bg="white").pack(anchor="w", padx=2)
+    scroll = Scrollbar(frame, orient="vertical")
+    heatmap = Listbox(frame, yscrollcommand=scroll.set, width=34, height=30, font=('Courier', 8), exportselection=False)
+    scroll.config(command=heatmap.yview)
+    scroll.pack(side="right", fill="y")
+    heatmap.pack(anchor="w", padx=2, pady=2)
+    for index, (heat, token_set) in enumerate(zip(profile.heat(), token_sets)):
+        heatmap.insert(END, f"{profile.executions[index]:>7} {index+1:>4}: {' '.join(token_set)}")
+        heatmap.itemconfig(index, background=heat_color(heat))
+    return heatmap
+
+
+def record_change(result: StepResult):
+    """Simulation subscriber collecting the (location, address) every displayed step writes"""
+    for location, address, old, new in result.changes:
+        step_view["changed"].add((location, address))
+
+
+def pane_text(location: str, key: int) -> str:
+    """Returns the pane entry for a register number or address key, None when the address holds nothing"""
+    if location == "registers":
+        return f"r{key} -> {emul.registers[key]}"
+    value = getattr(emul, location).get(key)
+    if value is None:
+        return None
+    return f"{ins.address_name(key)} -> {value}"
+
+
+def refresh_pane(location: str, keys):
+    """The refresh_pane method updates the pane rows of the given keys, leaving every other row untouched
+    keys None compares the whole pane against the machine state, used after a checkpoint was restored
+    """
+    pane, shown, rows, order = step_view["panes"][location]
+    if keys is None:
+        state = range(ins.register_count) if location == "registers" else getattr(emul, location)
+        keys = list(state) + [key for key in order if key not in state]
+    for key in keys:
+        text = pane_text(location, key)
+        if text == shown.get(key):
+            continue
+        if key not in shown:
+            rows[key] = len(order)
+            order.append(key)
+            shown[key] = text
+            pane.insert(END, text)
+            continue
+        row = rows[key]
+        pane.delete(row)
+        if text is None:
+            # only undoing a step removes an address, so renumbering the rows below it stays off the forward path
+            del shown[key], rows[key], order[row]
+            for moved in order[row:]:
+                rows[moved] -= 1
+        else:
+            pane.insert(row, text)
+            shown[key] = text
+
+
 def display_step(param_vals):
-    """The display_step method initializes window elements displaying CPU state after running a specific line of MiniASM.
+    """The display_step method updates the step view with the CPU state after running a specific line of MiniASM.
     MiniASM semantics parsing also provides addressing modes for load, store, read and write instructions,
     presents equivalent expressions for arithmetic operations and primary bus motions
+    Only the register, memory and disk entries the step changed are redrawn
     """
+    if len(step_view) == 0:
+        build_step_view(param_vals[0], param_vals[2])
     index: int = param_vals[1]
-    token_set = param_vals[0][index]
-    token_string = "String Line: " + " ".join(token_set)
-    next_index: int = emul.simulate_step(index)
+    if not run_step(index):
+        show_error()
+        return
+    draw_step(index, param_vals[0][index])
+
+
+def run_step(index: int) -> bool:
+    """The run_step method simulates the operation at index without touching any widget
+    Returns False when the operation raises a runtime error, keeping the state from before it in emul and the error in step_view
+    """
+    try:
+        next_index: int = emul.simulate_step(index)
+    except Exception as e:
+        step_view["error"] = runtime_message(e, index)
+        return False
     emul.log_index(index)
-    log_string = emul.make_log_string(index)
-    length: int = param_vals[2]
-    page_elements = []
-    title = Label(interface, text="ASM Visual", font=('Courier', 14), bg=bg_color)
-    title.pack(anchor="nw", padx=5, pady=5)
+    step_view["index"] = index
+    step_view["next_index"] = next_index
+    return True
+
+
+def show_error():
+    """The show_error method draws the last step that ran and reports the runtime error that stopped the program after it
+    Stepping forward stays disabled until the view steps back
+    """
+    step_view["next_index"] = emul.timeline.pc
+    if emul.timeline.step > 0:
+        index = emul.timeline.last_index
+        step_view["index"] = index
+        draw_step(index, step_view["token_sets"][index])
+    step_view["break_status"].config(text=step_view["error"])
+    step_view["next_button"].config(state=DISABLED)
+
+
+def draw_step(index: int, token_set: list[str]):
+    """The draw_step method reconfigures the step view widgets for the step that just ran index"""
     pc = "x"
     if index > 0:
         pc += f"+{4*index}"
-    first_line: str = f"Line {index+1}, PC = {pc}"
+    first_line: str = f"Step {emul.timeline.step}, Line {index+1}, PC = {pc}"
     if token_set[0] in emul.label_map:
         first_line += f", Label = {token_set[0]}"
-    subtitle = Label(interface, text=first_line, font=('Courier', 13), bg=bg_color)
-    subtitle.pack(anchor="nw", padx=5, pady=5)
-    labelFrame1 = LabelFrame(interface, bg="white")
-    labelFrame1.pack(side="left", padx=10, pady=10)
-    labelFrame2 = LabelFrame(interface, bg="white")
-    labelFrame2.pack(side="right", padx=10, pady=10)
-    page_elements.append(Label(labelFrame1, text="Element Breakdown:", font=('Courier', 10), bg="white"))
-    page_elements.append(Label(labelFrame1, text=token_string, font=('Courier', 8), bg="white"))
-    num_elements = 0
-    for element in log_string:
-        page_elements.append(Label(labelFrame1, text=element, font=('Courier', 8), bg="white"))
-        num_elements += 1
-    page_elements.append(Label(labelFrame2, text="Registers:", font=('Courier', 10), bg="white"))
-    labelFrames = [LabelFrame(labelFrame2, bg="white", width=10, height=2), LabelFrame(labelFrame2, bg="white", width=10, height=2), LabelFrame(labelFrame2, bg="white", width=10, height=2)]
-    '''
-    for frame in labelFrames:
-        frame.pack(padx=1, pady=1)
-        '''
-    scroll1 = Scrollbar(labelFrames[0],orient="vertical")
-    scroll2 = Scrollbar(labelFrames[1])
-    scroll3 = Scrollbar(labelFrames[2])
-    reg_list = Listbox(labelFrames[0], yscrollcommand=scroll1.set, width=10, height=3)
-    scroll1.pack(side="right", fill="y")
-    mem_list = Listbox(labelFrames[1], yscrollcommand=scroll2.set, width=10, height=3)
-    scroll2.pack(side="right", fill="y")
-    disk_list = Listbox(labelFrames[2], yscrollcommand=scroll3.set, width=10, height=3)
-    scroll3.pack(side="right", fill="y")
-    for element in emul.history["registers"].items():
-        reg_list.insert(END, f"{element[0]} -> {element[1]}")
-    page_elements.append(labelFrames[0])
-    page_elements.append(reg_list)
-    page_elements.append(Label(labelFrame2, text="Disk:", font=('Courier', 10), bg="white"))
-    for element in emul.history["disk"].items():
-        disk_list.insert(END, f"{element[0]} -> {element[1]}")
-    page_elements.append(labelFrames[1])
-    page_elements.append(disk_list)
-    page_elements.append(Label(labelFrame2, text="Memory:", font=('Courier', 10), bg="white"))
-    for element in emul.history["memory"].items():
-        disk_list.insert(END, f"{element[0]} -> {element[1]}")
-    page_elements.append(labelFrames[2])
-    page_elements.append(mem_list)
-    for i in range(4-num_elements):
-        page_elements.append(Label(labelFrame1, bg="white", width=42, font=('Courier', 8)))
-    if index == 0 and emul.index_log[-1] == 0:
-        page_elements.append(Label(labelFrame1, bg="white", text=" ", font=('Courier', 15)))
+    step_view["subtitle"].config(text=first_line)
+    step_view["token_label"].config(text="String Line: " + " ".join(token_set))
+    log_string = emul.make_log_string(index)
+    log_string.append(step_view["cost_model"].describe(emul.program[index]))
+    caches = step_view["caches"]
+    if emul.timeline.step <= len(caches.log):
+        log_string.append(caches.describe(caches.log[emul.timeline.step - 1]))
+    log_labels = step_view["log_labels"]
+    for label, text in zip(log_labels, log_string + [""] * (len(log_labels) - len(log_string))):
+        label.config(text=text)
+    changed = step_view["changed"]
+    for location in ("registers", "disk", "memory"):
+        if step_view["full_refresh"]:
+            refresh_pane(location, None)
+        else:
+            refresh_pane(location, [key for key_location, key in changed if key_location == location])
+    changed.clear()
+    step_view["full_refresh"] = False
+    step_view["back_button"].config(state=DISABLED if emul.timeline.step <= 1 else NORMAL)
+    step_view["next_button"].config(state=DISABLED if "halt" in token_set else NORMAL)
+    heatmap = step_view["heatmap"]
+    heatmap.selection_clear(0, END)
+    heatmap.selection_set(index)
+    heatmap.see(index)
+
+
+def seek_view(step: int) -> int:
+    """The seek_view method seeks the simulation while tracking which pane entries the seek changes
+    Steps undone from the timeline's delta log mark their addresses as changed, replayed steps are
+    recorded by record_change, and restoring a checkpoint marks every pane for a full comparison
+    """
+    timeline = emul.timeline
+    step = max(step, 0)
+    if timeline.segment_start <= step <= timeline.step:
+        first = len(timeline.locations) - (timeline.step - step)
+        for code, address in zip(timeline.locations[first:], timeline.addresses[first:]):
+            if code >= 0:
+                step_view["changed"].add((location_names[code], address))
+    else:
+        step_view["full_refresh"] = True
+    return emul.seek(step)
+
+
+def steps_per_second(value) -> int:
+    """Converts a speed slider position to steps per second; the slider is logarithmic"""
+    return max(1, round(10 ** float(value)))
+
+
+def toggle_play():
+    """The toggle_play method starts or pauses play mode"""
+    if step_view["playing"] is None:
+        start_play(False)
     else:
-        page_elements.append(Button(labelFrame1, font=('Courier', 10), text="< Back", bg="white", command=lambda params=(param_vals[0], index, length, page_elements): revert_step(params)))
-    if "halt" in token_set:
-        page_elements.append(Label(labelFrame1, font=('Courier', 15), text=" ", bg="white"))
+        pause_play()
+
+
+def run_until():
+    """The run_until method runs without drawing until a breakpoint hits or the program halts, then draws that step once"""
+    pause_play()
+    start_play(True)
+
+
+def start_play(until: bool):
+    """The start_play method arms the breakpoints and starts play mode, or run-until mode when until is set"""
+    breakpoints.arm(emul)
+    step_view["until"] = until
+    step_view["break_status"].config(text="Running..." if until else "")
+    step_view["play_button"].config(text="Pause")
+    play_frame()
+
+
+def pause_play():
+    """The pause_play method stops play and run-until mode, cancelling the scheduled frame"""
+    if step_view.get("playing") is not None:
+        interface.after_cancel(step_view["playing"])
+        step_view["playing"] = None
+    if "play_button" in step_view:
+        step_view["play_button"].config(text="Play")
+        if step_view["until"]:
+            step_view["until"] = False
+            draw_step(step_view["index"], step_view["token_sets"][step_view["index"]])
+            step_view["break_status"].config(text="Paused")
+
+
+def play_frame():
+    """The play_frame method advances play mode by one frame and schedules the next one with interface.after
+    Below one step per frame the frame is delayed to match the slider speed; above it, as many steps as the
+    speed asks for run per frame (bounded by the frame time so the window stays responsive) and the view is
+    redrawn once at the end of the frame
+    In run-until mode frames run as many steps as fit in the frame time and nothing is drawn until a breakpoint
+    hits or the program halts; play mode stops on breakpoints too
+    """
+    token_sets = step_view["token_sets"]
+    until = step_view["until"]
+    rate = steps_per_second(step_view["speed_scale"].get())
+    if until:
+        batch, delay = sys.maxsize, 1
+    elif rate * frame_ms < 1000:
+        batch, delay = 1, 1000 // rate
     else:
-        page_elements.append(Button(labelFrame1, font=('Courier', 10), text="Next >", bg="white", command=lambda params=(param_vals[0], next_index, length, page_elements): transition_display(params)))
-    page_elements.append(Button(labelFrame1, font=('Courier', 10), text="Back to Options", bg="white", command=lambda params=("option_page", page_elements): redirect(params)))
-    for element in page_elements:
-        element.pack(anchor="w", padx=2, pady=2)
-    page_elements.append(title)
-    page_elements.append(subtitle)
-    page_elements.append(labelFrame1)
-    page_elements.append(labelFrame1)
-    page_elements.append(labelFrame2)
-    page_elements.append(scroll1)
-    page_elements.append(scroll2)
-    page_elements.append(scroll3)
-
-
-def revert_step(params):
-    """The revert_step method calls simulation revert_step method"""
-    index = emul.revert_step(params[1])
-    transition_display((params[0],index,params[2],params[3]))
-
-
-def transition_display(params):
-    """Handles switching between steps to be displayed"""
-    param_vals = (params[0], params[1],params[2])
-    page_elements = params[3]
-    for element in page_elements:
-        element.destroy()
-    display_step(param_vals)
+        batch, delay = rate * frame_ms // 1000, frame_ms
+    deadline = time.perf_counter() + frame_ms / 1000
+    halted = "halt" in token_sets[step_view["index"]]
+    failed = False
+    for count in range(batch):
+        if halted or breakpoints.hit is not None or (count > 0 and time.perf_counter() > deadline):
+            break
+        if not run_step(step_view["next_index"]):
+            failed = True
+            break
+        halted = "halt" in token_sets[step_view["index"]]
+    stopped = halted or failed or breakpoints.hit is not None
+    if (stopped or not until) and not failed:
+        draw_step(step_view["index"], token_sets[step_view["index"]])
+    if stopped:
+        step_view["playing"] = None
+        step_view["until"] = False
+        pause_play()
+        if failed:
+            show_error()
+        elif breakpoints.hit is not None:
+            step_view["break_status"].config(text=f"Stopped at breakpoint: {breakpoints.hit}")
+        elif until:
+            step_view["break_status"].config(text="Program halted")
+    else:
+        step_view["playing"] = interface.after(delay, play_frame)
+
+
+def refresh_breakpoints():
+    """The refresh_breakpoints method refills the breakpoint list"""
+    break_list = step_view["break_list"]
+    break_list.delete(0, END)
+    for spec in breakpoints.specs():
+        break_list.insert(END, spec)
+
+
+def add_breakpoint(entry):
+    """The add_breakpoint method adds the breakpoint typed into the breakpoint entry, reporting malformed ones"""
+    try:
+        spec = breakpoints.add(entry.get(), emul)
+    except Exception as e:
+        step_view["break_status"].config(text=str(e).replace("Error:\n", ""))
+        return
+    entry.delete(0, END)
+    step_view["break_status"].config(text=f"Added breakpoint: {spec}")
+    refresh_breakpoints()
+
+
+def remove_breakpoint():
+    """The remove_breakpoint method removes the breakpoint selected in the breakpoint list"""
+    selection = step_view["break_list"].curselection()
+    if len(selection) == 0:
+        return
+    breakpoints.remove(step_view["break_list"].get(selection[0]))
+    refresh_breakpoints()
+
+
+def next_step():
+    """The next_step method runs and displays the next operation"""
+    display_step((step_view["token_sets"], step_view["next_index"], step_view["length"]))
+
+
+def back_step():
+    """The back_step method returns the view to the previous step"""
+    pause_play()
+    index = seek_view(emul.timeline.step - 2)
+    display_step((step_view["token_sets"], index, step_view["length"]))
+
+
+def jump_step(entry):
+    """The jump_step method seeks the simulation to the step number typed into the step entry
+    Steps past the end of the program stop on its halt instruction
+    """
+    try:
+        step = max(int(entry.get()), 1)
+    except ValueError:
+        return
+    pause_play()
+    try:
+        index = seek_view(step - 1)
+    except Exception as e:
+        # the program fails before reaching step, so the view stops at the error
+        step_view["full_refresh"] = True
+        step_view["error"] = runtime_message(e, emul.timeline.pc)
+        show_error()
+        return
+    if emul.timeline.finished(emul.program):
+        index = seek_view(emul.timeline.step - 1)
+    display_step((step_view["token_sets"], index, step_view["length"]))
+
+
+def leave_step_view():
+    """The leave_step_view method tears the step view down and returns to the option page"""
+    pause_play()
+    emul.unsubscribe(record_change)
+    if breakpoints in emul.observers:
+        emul.observers.remove(breakpoints)
+    interface.geometry(home_geometry)
+    page_elements = step_view["elements"]
+    step_view.clear()
+    redirect(("option_page", page_elements))
 
 
 def visualize():
     """Handles initialization of visualizer by calling the start method from Visualizer class"""
     page_elements = []
     token_sets = v.start(emul)[1]
+    try:
+        emul.compile()
+        emul.enable_timeline()
+    except Exception:
+        token_sets = []
     length = len(token_sets)
     if length > 0:
         index = 0
@@ -395,20 +780,9 @@ def visualize():
 
 def history_clear(params):
     """The history_clear method, resets data structures for Simulator functions"""
-    emul.history = {
-        "registers": defaultdict(str),
-        "memory": defaultdict(str),
-        "disk": defaultdict(str)
-    }
-    emul.base_cache = {
-        "memory": defaultdict(str),
-        "disk": defaultdict(str)
-    }
-    emul.label_map = defaultdict()
-    emul.operation_log = []
-    emul.index_log = [0]
-    emul.curr_line = 0
-    emul.cache_log = []
+    global breakpoints
+    emul.clear()
+    breakpoints = Breakpoints()
     redirect(params)
 
 
@@ -416,16 +790,7 @@ def history_reset():
     """The history_clear method, resets data structures for Simulator functions,
     Sets the memory and disk values to the base_cache elements
     """
-    emul.history = {
-        "registers": defaultdict(str),
-        "memory": emul.base_cache["memory"],
-        "disk": emul.base_cache["disk"]
-    }
-    emul.label_map = defaultdict()
-    emul.operation_log = []
-    emul.index_log = [0]
-    emul.curr_line = 0
-    emul.cache_log = []
+    emul.reset()
 
 
 def option_page():
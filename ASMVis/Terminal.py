@@ -0,0 +1,327 @@
+import argparse
+import curses
+import sys
+from bisect import bisect_left, insort
+import Instructions as ins
+import Visualizer as v
+from Breakpoints import Breakpoints
+from Simulation import Simulation, StepResult, runtime_message
+
+"""
+Terminal step visualizer for MiniASM, for hosts without a display
+Runs on the same Simulation, Timeline and Breakpoints as the Tk step view, drawing with curses
+Forward steps only redraw the pane rows their StepResult changed; seeks compare the visible rows against
+what is already drawn, so only rows whose text differs are written
+Usage (from the ASMVis directory): python -m Terminal <file> [--memory ADDRESS=VALUE ...] [--disk ADDRESS=VALUE ...]
+"""
+
+help_text: str = "n/space step  b back  r run  g go to step  t toggle line breakpoint  a add  d delete  l list  q quit"
+run_batch: int = 4096 # steps run between checks for a key that interrupts a run
+register_rows: int = ins.register_count
+
+
+class Pane:
+
+    def __init__(self, title: str, height: int, width: int, y: int, x: int):
+        """The Pane Constructor initializes the below variables:
+            - window: bordered curses window the pane draws in
+            - shown: (text, highlighted) of every visible row as last drawn, so only rows that differ are rewritten
+            - offset: index of the first visible row
+        """
+        self.window = curses.newwin(height, width, y, x)
+        self.window.box()
+        self.window.addnstr(0, 2, f" {title} ", width - 4)
+        self.window.noutrefresh()
+        self.shown: list[tuple[str, bool]] = [None] * max(height - 2, 0)
+        self.offset = 0
+
+    def visible(self) -> int:
+        return len(self.shown)
+
+    def follow(self, row: int):
+        """Scrolls the pane so row is visible"""
+        if row < self.offset:
+            self.offset = row
+        elif row >= self.offset + self.visible():
+            self.offset = row - self.visible() + 1
+
+    def show(self, count: int, row_text, highlight: int = -1):
+        """Draws the visible rows of count rows, each built by row_text(row), highlighting row highlight
+        Rows whose text matches what the pane already shows are not rewritten
+        """
+        width = self.window.getmaxyx()[1] - 2
+        self.offset = max(0, min(self.offset, count - self.visible()))
+        drawn = False
+        for line in range(self.visible()):
+            row = self.offset + line
+            text = (row_text(row) if row < count else "")[:width]
+            if self.shown[line] == (text, row == highlight):
+                continue
+            self.window.addstr(line + 1, 1, text.ljust(width), curses.A_REVERSE if row == highlight else curses.A_NORMAL)
+            self.shown[line] = (text, row == highlight)
+            drawn = True
+        if drawn:
+            self.window.noutrefresh()
+
+
+class TerminalView:
+
+    def __init__(self, screen, emul: Simulation, token_sets: list[list[str]], path: str):
+        """The TerminalView Constructor initializes the below variables:
+            - screen: curses screen, holding the header and status lines
+            - emul: numeric Simulation with a timeline, holding the assembled program
+            - token_sets: tokens of every non-empty program line, shown in the source pane
+            - path: file being visualized
+            - breakpoints: line and conditional breakpoints, an observer of emul
+            - changed: (location, address) written since the panes were last drawn, collected from StepResults
+            - keys: "memory" and "disk" -> sorted address keys listed by their panes
+            - full_refresh: whether the next draw compares every pane against the machine state, set after seeks
+            - source_dirty: whether the source pane needs drawing (the pc or the line breakpoints changed)
+            - message: status line text, the key help when empty
+            - error: the runtime error that stopped the program, None while it can step
+        """
+        self.screen = screen
+        self.emul = emul
+        self.token_sets = token_sets
+        self.path = path
+        self.breakpoints = Breakpoints()
+        self.changed: set[tuple[str, int]] = set()
+        self.keys: dict[str, list[int]] = {"memory": [], "disk": []}
+        self.full_refresh = True
+        self.source_dirty = True
+        self.message = ""
+        self.error: str = None
+        self.panes: dict[str, Pane] = {}
+        emul.observers.append(self.breakpoints)
+        emul.subscribe(self.record_change)
+        curses.curs_set(0)
+        self.layout()
+
+    def close(self):
+        """Detaches the view from emul"""
+        self.emul.unsubscribe(self.record_change)
+        if self.breakpoints in self.emul.observers:
+            self.emul.observers.remove(self.breakpoints)
+
+    def record_change(self, result: StepResult):
+        """Simulation subscriber collecting the (location, address) every step writes"""
+        for location, address, old, new in result.changes:
+            self.changed.add((location, address))
+
+    def layout(self):
+        """Creates the panes for the current terminal size, the source on the left and the machine state on the right"""
+        self.screen.erase()
+        self.screen.noutrefresh()
+        height, width = self.screen.getmaxyx()
+        body = height - 2
+        right = min(40, width // 2)
+        register_height = min(register_rows + 2, body // 2)
+        state_height = (body - register_height) // 2
+        self.panes = {
+            "source": Pane("Source", body, width - right, 1, 0),
+            "registers": Pane("Registers", register_height, right, 1, width - right),
+            "memory": Pane("Memory", state_height, right, 1 + register_height, width - right),
+            "disk": Pane("Disk", body - register_height - state_height, right, 1 + register_height + state_height, width - right)
+        }
+        self.full_refresh = True
+        self.source_dirty = True
+
+    def state_row(self, location: str, row: int) -> str:
+        if location == "registers":
+            return f"r{row:<3}{self.emul.registers[row]}"
+        key = self.keys[location][row]
+        return f"{ins.address_name(key):>10} -> {getattr(self.emul, location)[key]}"
+
+    def source_row(self, row: int) -> str:
+        mark = "*" if row in self.breakpoints.lines else " "
+        return f"{mark}{row+1:>5}  {' '.join(self.token_sets[row])}"
+
+    def draw(self):
+        """Redraws the header, the status line and the panes whose contents changed since the last draw"""
+        timeline = self.emul.timeline
+        height, width = self.screen.getmaxyx()
+        finished = timeline.finished(self.emul.program)
+        if self.error is not None:
+            state = f"stopped by an error on line {timeline.pc+1}"
+        else:
+            state = "halted" if finished else f"next line {timeline.pc+1}"
+        header = f" {self.path}  step {timeline.step}  {state}"
+        self.screen.addnstr(0, 0, header.ljust(width), width - 1, curses.A_BOLD)
+        self.screen.addnstr(height - 1, 0, (self.message or help_text).ljust(width), width - 1)
+        self.screen.noutrefresh()
+        if self.source_dirty:
+            source = self.panes["source"]
+            if not finished:
+                source.follow(timeline.pc)
+            source.show(len(self.token_sets), self.source_row, -1 if finished else timeline.pc)
+            self.source_dirty = False
+        if self.full_refresh:
+            dirty = {"registers", "memory", "disk"}
+            for location in ("memory", "disk"):
+                self.keys[location] = sorted(getattr(self.emul, location))
+        else:
+            dirty = {location for location, address in self.changed}
+            for location, address in self.changed:
+                if location != "registers":
+                    keys = self.keys[location]
+                    row = bisect_left(keys, address)
+                    if row == len(keys) or keys[row] != address:
+                        insort(keys, address)
+                    self.panes[location].follow(row)
+        for location in ("registers", "memory", "disk"):
+            if location in dirty:
+                count = register_rows if location == "registers" else len(self.keys[location])
+                self.panes[location].show(count, lambda row, location=location: self.state_row(location, row))
+        self.changed.clear()
+        self.full_refresh = False
+        curses.doupdate()
+
+    def fail(self, e: Exception):
+        """Stops the program at a runtime error, keeping the state from before the failing step"""
+        self.error = runtime_message(e, self.emul.timeline.pc)
+        self.message = self.error
+
+    def step(self) -> bool:
+        """Runs the next operation, returning False when the program cannot step any further"""
+        timeline = self.emul.timeline
+        if self.error is not None or timeline.finished(self.emul.program):
+            return False
+        try:
+            self.emul.simulate_step(timeline.pc)
+        except Exception as e:
+            self.fail(e)
+            return False
+        self.source_dirty = True
+        return True
+
+    def seek(self, step: int):
+        """Moves to the state after step executed steps, stopping at a halt or a runtime error"""
+        self.error = None
+        try:
+            self.emul.seek(step)
+        except Exception as e:
+            self.fail(e)
+        self.full_refresh = True
+        self.source_dirty = True
+
+    def run(self):
+        """Runs until a breakpoint hits or the program halts; any key interrupts the run"""
+        self.breakpoints.arm(self.emul)
+        self.message = "Running... press any key to stop"
+        self.draw()
+        self.screen.nodelay(True)
+        try:
+            while True:
+                for count in range(run_batch):
+                    if not self.step() or self.breakpoints.hit is not None:
+                        break
+                else:
+                    if self.screen.getch() == -1:
+                        continue
+                    self.message = "Stopped"
+                    return
+                break
+            if self.error is not None:
+                self.message = self.error
+            elif self.breakpoints.hit is not None:
+                self.message = f"Stopped at breakpoint: {self.breakpoints.hit}"
+            else:
+                self.message = "Program halted"
+        finally:
+            self.screen.nodelay(False)
+
+    def prompt(self, label: str) -> str:
+        """Reads a line typed on the status line"""
+        height, width = self.screen.getmaxyx()
+        self.screen.addnstr(height - 1, 0, label.ljust(width), width - 1)
+        curses.echo()
+        curses.curs_set(1)
+        try:
+            return self.screen.getstr(height - 1, len(label), max(width - len(label) - 1, 1)).decode(errors="replace").strip()
+        finally:
+            curses.noecho()
+            curses.curs_set(0)
+
+    def toggle_breakpoint(self):
+        """Adds or removes the line breakpoint on the next line to execute"""
+        pc = self.emul.timeline.pc
+        spec = f"line {pc+1}"
+        if pc in self.breakpoints.lines:
+            self.breakpoints.remove(spec)
+            self.message = f"Removed breakpoint: {spec}"
+        else:
+            self.breakpoints.add(spec, self.emul)
+            self.message = f"Added breakpoint: {spec}"
+        self.source_dirty = True
+
+    def handle(self, key: int) -> bool:
+        """Acts on one key press, returning False to quit"""
+        self.message = ""
+        if key in (ord("q"), ord("Q")):
+            return False
+        elif key in (ord("n"), ord(" "), curses.KEY_RIGHT):
+            if not self.step():
+                self.message = self.error or "Program halted"
+        elif key in (ord("b"), curses.KEY_LEFT):
+            self.seek(self.emul.timeline.step - 1)
+        elif key == ord("r"):
+            self.run()
+        elif key == ord("g"):
+            try:
+                self.seek(int(self.prompt("Go to step: ")))
+            except ValueError:
+                self.message = "Steps are numbers"
+        elif key == ord("t"):
+            self.toggle_breakpoint()
+        elif key == ord("a"):
+            try:
+                self.message = f"Added breakpoint: {self.breakpoints.add(self.prompt('Breakpoint: '), self.emul)}"
+            except Exception as e:
+                self.message = str(e).replace("Error:\n", "").replace("\n", " ")
+            self.source_dirty = True
+        elif key == ord("d"):
+            self.breakpoints.remove(" ".join(self.prompt("Remove breakpoint: ").lower().split()))
+            self.source_dirty = True
+        elif key == ord("l"):
+            self.message = "Breakpoints: " + (", ".join(self.breakpoints.specs()) or "none")
+        elif key == curses.KEY_RESIZE:
+            self.layout()
+        return True
+
+    def loop(self):
+        """Draws and handles keys until the user quits"""
+        try:
+            self.draw()
+            while self.handle(self.screen.getch()):
+                self.draw()
+        finally:
+            self.close()
+
+
+def main(argv: list[str] = None) -> int:
+    arg_parser = argparse.ArgumentParser(prog="python -m Terminal", description="Step through a MiniASM program in the terminal")
+    arg_parser.add_argument("file")
+    arg_parser.add_argument("--memory", action="append", default=[], metavar="ADDRESS=VALUE", help="memory preset, may be repeated")
+    arg_parser.add_argument("--disk", action="append", default=[], metavar="ADDRESS=VALUE", help="disk preset, may be repeated")
+    args = arg_parser.parse_args(argv)
+    emul = Simulation(numeric=True)
+    for location, presets in (("memory", args.memory), ("disk", args.disk)):
+        for preset in presets:
+            address, _, data = preset.partition("=")
+            try:
+                emul.set_base(location, address.strip(), data.strip())
+            except ValueError:
+                print(f"Error:\n{location} preset \"{preset}\" should be ADDRESS=VALUE with numeric values", file=sys.stderr)
+                return 1
+    message, token_sets = v.Assembler(args.file).start(emul)
+    if message != v.success_message:
+        print(message, file=sys.stderr)
+        return 1
+    emul.compile()
+    emul.enable_timeline()
+    curses.wrapper(lambda screen: TerminalView(screen, emul, token_sets, args.file).loop())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
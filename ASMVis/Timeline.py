@@ -0,0 +1,139 @@
+from array import array
+from bisect import bisect_right
+import Instructions as ins
+
+"""
+Timeline keeps the execution history of a numeric Simulation for time travel
+Full checkpoints are taken every interval steps; in between, a compact delta log records
+what each step overwrote so recent steps can be undone directly
+Seeking restores the nearest earlier checkpoint and replays forward from it
+Checkpoints are spaced at least state_ratio times the memory and disk size apart, so programs
+with large memory footprints never store more checkpoint entries than a fraction of their steps
+"""
+
+default_interval: int = 1024
+state_ratio: int = 4
+location_codes: dict[str, int] = {"registers": 0, "memory": 1, "disk": 2}
+location_names: tuple[str, ...] = ("registers", "memory", "disk")
+
+
+class Timeline:
+
+    def __init__(self, interval: int = default_interval):
+        """The Timeline Constructor initializes the below variables:
+            - interval: minimum number of steps between full checkpoints
+            - checkpoints: (pc, last index, registers, memory, disk) state at the steps in checkpoint_steps
+            - checkpoint_steps: sorted step numbers of the checkpoints
+            - next_checkpoint: step at which the next checkpoint boundary lies
+            - step: number of steps executed so far
+            - pc: index of the next operation to execute
+            - last_index: index of the operation executed by the latest step, -1 before the first step
+            - segment_start: step of the latest checkpoint passed, the oldest step the delta log can undo to
+            - indexes, locations, addresses, olds, present: delta log of the current segment, one entry per step
+              (executed index, written location code or -1, address, overwritten value, whether a value existed)
+        """
+        self.interval = interval
+        self.checkpoints: list[tuple] = []
+        self.checkpoint_steps = array('q')
+        self.next_checkpoint = 0
+        self.step = 0
+        self.pc = 0
+        self.last_index = -1
+        self.segment_start = 0
+        self.indexes = array('q')
+        self.locations = array('b')
+        self.addresses = array('q')
+        self.olds = array('q')
+        self.present = array('b')
+
+    def spacing(self, sim) -> int:
+        """Steps until the checkpoint after one taken from sim's current state"""
+        return max(self.interval, state_ratio * (len(sim.memory) + len(sim.disk)))
+
+    def clear_segment(self):
+        """Empties the delta log, starting a new segment at the current step"""
+        del self.indexes[:]
+        del self.locations[:]
+        del self.addresses[:]
+        del self.olds[:]
+        del self.present[:]
+        self.segment_start = self.step
+
+    def before_step(self, sim, index: int):
+        """Called before each step; takes a checkpoint at a boundary that has not been checkpointed yet"""
+        if self.step != self.next_checkpoint:
+            return
+        number = bisect_right(self.checkpoint_steps, self.step)
+        if number == 0 or self.checkpoint_steps[number-1] != self.step:
+            self.checkpoints.append((index, self.last_index, array('q', sim.registers), dict(sim.memory), dict(sim.disk)))
+            self.checkpoint_steps.append(self.step)
+            number += 1
+        self.clear_segment()
+        if number < len(self.checkpoint_steps):
+            self.next_checkpoint = self.checkpoint_steps[number]
+        else:
+            self.next_checkpoint = self.step + self.spacing(sim)
+
+    def record(self, index: int, target: tuple[str, int], old: int, next_index: int):
+        """Appends a step to the delta log
+        target is the (location, address) the step wrote, or None, and old the value it overwrote, or None
+        """
+        self.indexes.append(index)
+        if target is None:
+            self.locations.append(-1)
+            self.addresses.append(0)
+        else:
+            self.locations.append(location_codes[target[0]])
+            self.addresses.append(target[1])
+        self.olds.append(0 if old is None else old)
+        self.present.append(old is not None)
+        self.step += 1
+        self.pc = next_index
+        self.last_index = index
+
+    def undo(self, sim):
+        """Reverts the latest step of the current segment"""
+        index = self.indexes.pop()
+        code = self.locations.pop()
+        address = self.addresses.pop()
+        old = self.olds.pop()
+        present = self.present.pop()
+        if code == 0:
+            sim.registers[address] = old
+        elif code > 0:
+            state = getattr(sim, location_names[code])
+            if present:
+                state[address] = old
+            else:
+                state.pop(address, None)
+        self.step -= 1
+        self.pc = index
+        if len(self.indexes) > 0:
+            self.last_index = self.indexes[-1]
+        else:
+            self.last_index = self.checkpoints[bisect_right(self.checkpoint_steps, self.step) - 1][1]
+
+    def nearest(self, step: int) -> int:
+        """Returns the number of the latest checkpoint at or before step"""
+        return max(bisect_right(self.checkpoint_steps, step) - 1, 0)
+
+    def restore(self, sim, number: int):
+        """Restores checkpoint number, leaving an empty delta log"""
+        pc, last_index, registers, memory, disk = self.checkpoints[number]
+        sim.registers = array('q', registers)
+        sim.memory = dict(memory)
+        sim.disk = dict(disk)
+        self.step = self.checkpoint_steps[number]
+        self.pc = pc
+        self.last_index = last_index
+        self.clear_segment()
+        if number + 1 < len(self.checkpoint_steps):
+            self.next_checkpoint = self.checkpoint_steps[number+1]
+        else:
+            self.next_checkpoint = self.step + self.spacing(sim)
+
+    def finished(self, program: list) -> bool:
+        """Whether the program cannot step any further: the latest step was a halt or pc is past the end"""
+        if self.pc >= len(program):
+            return True
+        return self.last_index >= 0 and program[self.last_index].opcode == ins.opcodes["halt"]
@@ -0,0 +1,195 @@
+import mmap
+import struct
+from typing import Iterator
+import Instructions as ins
+from Simulation import default_max_steps
+
+"""
+Binary execution traces of compiled MiniASM runs
+A trace file is a short header followed by one fixed-size little-endian record per executed step:
+    step (u64), pc (i32), opcode id (u8), written location code (i8, -1 when nothing was written),
+    written address (i64) and the value stored there after the step (i64)
+TraceRecorder is a Simulation observer streaming records to disk; TraceReader memory-maps a trace
+to replay it onto a Simulation or diff it against another trace without re-simulating
+"""
+
+magic: bytes = b"MASMTRC1"
+trace_version: int = 1
+header_format = struct.Struct("<8sHH")
+record_format = struct.Struct("<QiBbqq")
+location_codes: dict[str, int] = {"registers": 0, "memory": 1, "disk": 2}
+location_names: tuple[str, ...] = ("registers", "memory", "disk")
+buffer_records: int = 4096 # records buffered in memory between writes, and read per chunk when iterating
+
+
+class TraceRecorder:
+
+    def __init__(self, path: str):
+        """The TraceRecorder Constructor initializes the below variables:
+            - path: trace file written by the recorder, truncated when the recorder is created
+            - file: open binary handle on path
+            - buffer: preallocated bytes for buffer_records records, written out when full
+            - used: number of buffer bytes holding records not yet written
+            - step: number of steps recorded so far
+        Attach a recorder to a numeric Simulation with attach, and close it once the run is over
+        """
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(header_format.pack(magic, trace_version, record_format.size))
+        self.buffer = bytearray(buffer_records * record_format.size)
+        self.used = 0
+        self.step = 0
+
+    def attach(self, sim) -> "TraceRecorder":
+        """Registers the recorder as an observer of sim and returns it"""
+        sim.observers.append(self)
+        return self
+
+    def detach(self, sim):
+        """Stops recording sim's steps"""
+        if self in sim.observers:
+            sim.observers.remove(self)
+
+    def __call__(self, sim, index: int, op: ins.Instruction, target: tuple[str, int], next_index: int):
+        """Observer hook recording the step that just executed op at index"""
+        if target is None:
+            code, address, value = -1, 0, 0
+        else:
+            location, address = target
+            code = location_codes[location]
+            if code == 0:
+                value = sim.registers[address]
+            else:
+                value = getattr(sim, location).get(address, 0)
+        record_format.pack_into(self.buffer, self.used, self.step, index, op.opcode, code, address, value)
+        self.step += 1
+        self.used += record_format.size
+        if self.used == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        """Writes buffered records to the file"""
+        if self.used > 0:
+            self.file.write(memoryview(self.buffer)[:self.used])
+            self.used = 0
+        self.file.flush()
+
+    def close(self):
+        """Flushes remaining records and closes the file"""
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self) -> "TraceRecorder":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TraceReader:
+
+    def __init__(self, path: str):
+        """The TraceReader Constructor initializes the below variables:
+            - path: trace file being read
+            - file, map: open handle and read-only memory map of the file; records are decoded on access
+            - count: number of complete records in the trace
+        raises Exception when path is not a trace written by this version
+        """
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise Exception(f"Error:\n\"{path}\" is not a MiniASM trace")
+        if len(self.map) < header_format.size or header_format.unpack_from(self.map) != (magic, trace_version, record_format.size):
+            self.close()
+            raise Exception(f"Error:\n\"{path}\" is not a MiniASM trace")
+        self.count = (len(self.map) - header_format.size) // record_format.size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, step: int) -> tuple[int, int, int, int, int, int]:
+        """Returns the (step, pc, opcode, location code, address, value) record of step"""
+        if step < 0:
+            step += self.count
+        if not 0 <= step < self.count:
+            raise IndexError(f"step {step} is outside the trace")
+        return record_format.unpack_from(self.map, header_format.size + step * record_format.size)
+
+    def __iter__(self) -> Iterator[tuple[int, int, int, int, int, int]]:
+        """Streams every record, decoding buffer_records records at a time"""
+        return self.records(0, self.count)
+
+    def records(self, start: int, stop: int) -> Iterator[tuple[int, int, int, int, int, int]]:
+        """Streams the records of steps start to stop (exclusive)"""
+        stop = min(stop, self.count)
+        size = record_format.size
+        for chunk in range(start, stop, buffer_records):
+            first = header_format.size + chunk * size
+            last = header_format.size + min(chunk + buffer_records, stop) * size
+            yield from record_format.iter_unpack(self.map[first:last])
+
+    def replay(self, sim, stop: int = None) -> int:
+        """Applies the writes of the first stop steps (all steps when None) to sim's numeric state
+        sim should hold the machine state the traced run started from
+        Returns the pc of the next operation to execute, -1 for an empty trace
+        """
+        stop = self.count if stop is None else min(stop, self.count)
+        registers = sim.registers
+        states = (None, sim.memory, sim.disk)
+        for step, index, opcode, code, address, value in self.records(0, stop):
+            if code == 0:
+                registers[address] = value
+            elif code > 0:
+                states[code][address] = value
+        if stop > 0:
+            return self.next_pc(stop - 1)
+        return self[0][1] if self.count > 0 else -1
+
+    def next_pc(self, step: int) -> int:
+        """Returns the pc following step: the next record's pc, or the one after a final operation"""
+        if step + 1 < self.count:
+            return self[step+1][1]
+        return self[step][1] + 1
+
+    def diff(self, other: "TraceReader") -> int:
+        """Returns the first step at which the two traces differ, or None when they are identical
+        Equal stretches are compared as raw bytes, so only the block holding the divergence is decoded
+        When one trace is a prefix of the other, the step after the shorter one ends is returned
+        """
+        size = record_format.size
+        count = min(self.count, other.count)
+        for chunk in range(0, count, buffer_records):
+            first = header_format.size + chunk * size
+            last = header_format.size + min(chunk + buffer_records, count) * size
+            if self.map[first:last] != other.map[first:last]:
+                for step in range(chunk, min(chunk + buffer_records, count)):
+                    if self[step] != other[step]:
+                        return step
+        if self.count != other.count:
+            return count
+        return None
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self) -> "TraceReader":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def record_run(sim, path: str, index: int = 0, max_steps: int = default_max_steps) -> tuple[int, float]:
+    """Runs sim's program from index while recording its trace to path
+    Returns run's (steps, seconds)
+    """
+    with TraceRecorder(path).attach(sim) as recorder:
+        try:
+            return sim.run(index, max_steps)
+        finally:
+            recorder.detach(sim)
@@ -1,4 +1,8 @@
+from itertools import chain
+import re
+from typing import Iterator
 import Grammar as grm
+from AssemblyCache import AssemblyCache
 
 """
 Author: Efren Haskell
@@ -8,40 +12,301 @@ Visualizer class handles tokenization and high-level parsing
 
 spec_tokens = {"[", "]", "=", "$", "@", ",", " ", "\t", "\n"}
 ignore = {" ", "\t", "\n"} # skip whitespace
+# a token is a run of non-spec characters or a single non-ignore spec token
+token_pattern = re.compile("[^\\[\\]=$@, \t\n]+|[\\[\\]=$@,]")
 file_nm = "" # global variable for file name
+cache = AssemblyCache() # assembly cache shared by the module-level start
+success_message: str = "Looks good! No syntax errors found!"
+
+
+class Assembler:
+
+    def __init__(self, file_nm: str, cache: AssemblyCache = None):
+        """The Assembler Constructor initializes the below variables:
+            - file_nm: path of the MiniASM file to assemble
+            - parser: Grammar.Parser owning the label table and token buffer for this file
+            - cache: optional AssemblyCache consulted by start before assembling
+            - source: raw lines of the program held for incremental re-assembly, None until reassemble is called
+            - line_tokens, line_types, line_labels, line_ops: per raw line tokens, parsed types ([] for empty lines,
+              None for lines with syntax errors), label tokens and skeleton (None for empty or invalid lines)
+            - loaded: whether the emul passed to reassemble and update currently holds this program
+        Assemblers share no state besides the cache, so several files can be assembled at once from threads or processes
+        """
+        self.file_nm = file_nm
+        self.parser = grm.Parser()
+        self.cache = cache
+        self.source: list[str] = None
+        self.line_tokens: list[list[str]] = []
+        self.line_types: list[list[str]] = []
+        self.line_labels: list[tuple[str, ...]] = []
+        self.line_ops: list[tuple] = []
+        self.loaded: bool = False
+
+    def lines(self) -> Iterator[str]:
+        """Streams raw lines from the file, holding only one line in memory at a time"""
+        with open(self.file_nm, 'r') as file:
+            yield from file
+
+    def parsed(self) -> Iterator[tuple[int, list[str], list[str]]]:
+        """Streams (line_index, tokens, types) for every non-empty line
+        line_index counts non-empty lines from 1, matching operation_log indexes
+        raises Exception at the first syntax error
+        """
+        self.parser.labels = set()
+        line_index: int = 1
+        for tokens in tokenize_lines(self.lines()):
+            yield line_index, tokens, self.parser.parse(tokens, line_index)
+            line_index += 1
+
+    def encoded(self, emul) -> Iterator[tuple[int, list[str], list[str]]]:
+        """Streams parsed lines after encoding each one into emul's operation_log"""
+        for line_index, tokens, t_types in self.parsed():
+            emul.encode_skel(tokens, t_types, line_index)
+            yield line_index, tokens, t_types
+
+    def check(self, parsed: Iterator[tuple[int, list[str], list[str]]], lines: list[list[str]] = None,
+              type_lists: list[list[str]] = None) -> str:
+        """Drains a parsed line stream, returning the success message or the first error
+        Token and type lists are only kept when lines and type_lists are given to collect them
+        """
+        line_count: int = 0
+        t_types: list[str] = []
+        try:
+            for line_count, tokens, t_types in parsed:
+                if lines is not None:
+                    lines.append(tokens)
+                if type_lists is not None:
+                    type_lists.append(t_types)
+        except Exception as e:
+            self.parser.labels = set()
+            return e
+        if len(t_types) == 0 or t_types[-1] != "halt":
+            return f"Error: line {line_count+1} -> All programs must end with a halt instruction"
+        return success_message
+
+    def branch_operands(self, parsed: Iterator[tuple[int, list[str], list[str]]],
+                        targets: list[tuple[int, str]]) -> Iterator[tuple[int, list[str], list[str]]]:
+        """Passes a parsed line stream through, collecting the (line_index, label) of every branch target into targets"""
+        for line_index, tokens, t_types in parsed:
+            targets.extend((line_index, token.lower()) for token, t_type in zip(tokens, t_types) if t_type == "id")
+            yield line_index, tokens, t_types
+
+    def target_errors(self, targets: list[tuple[int, str]]) -> list[grm.ParseError]:
+        """Checks collected branch targets against the labels of the whole file, once every line has been parsed
+        Returns an error for every branch to a label that is never defined, as start reports them
+        """
+        labels: set[str] = self.parser.labels
+        return [grm.ParseError(f"Error:\nLine {line} -> Branch target \"{label}\" is not a defined label", line, label, ("label",))
+                for line, label in targets if label + ":" not in labels]
+
+    def validate(self) -> str:
+        """Syntax checks the file without encoding it or keeping any tokens, including branches to undefined labels
+        Memory use is bounded by the longest line, the label table and the branch targets, so multi-megabyte programs can be checked
+        """
+        targets: list[tuple[int, str]] = []
+        message = self.check(self.branch_operands(self.parsed(), targets))
+        if message != success_message:
+            return str(message)
+        errors: list[grm.ParseError] = self.target_errors(targets)
+        return str(errors[0]) if errors else message
+
+    def diagnostics(self) -> list[grm.ParseError]:
+        """Syntax checks the file in one pass, collecting every error instead of stopping at the first
+        A line with an error is skipped, though the labels it defines still count as defined, as in reassemble
+        Branch targets are checked against the labels of the whole file once every line has been seen
+        Returns the errors ordered by line, empty when start would report success_message
+        """
+        self.parser.labels = set()
+        errors: list[grm.ParseError] = []
+        targets: list[tuple[int, str]] = []
+        line_index: int = 0
+        last_types: list[str] = []
+        for line_index, tokens in enumerate(tokenize_lines(self.lines()), 1):
+            try:
+                last_types = self.parser.parse(tokens, line_index)
+            except grm.ParseError as e:
+                errors.append(e)
+                self.parser.labels.update(label_tokens(tokens))
+                last_types = None
+                continue
+            targets.extend((line_index, token.lower()) for token, t_type in zip(tokens, last_types) if t_type == "id")
+        errors.extend(self.target_errors(targets))
+        if last_types is not None and (len(last_types) == 0 or last_types[-1] != "halt"):
+            # a final line with an error may well have been the halt, so only a parsed final line is checked
+            errors.append(grm.ParseError(f"Error: line {line_index+1} -> All programs must end with a halt instruction", line_index + 1, None, ("halt",)))
+        errors.sort(key=lambda error: error.line)
+        return errors
+
+    def start(self, emul) -> tuple[str, list[list[str]]]:
+        """Main entry point for Assembler
+        returns tuple[str, list[list[str]]]
+
+            - Handles high-level parsing, tokenization and lexical analysis of file contents
+            - Files should be UTF-8 encoded
+            - Errors handled and returned as strings
+                - Second return value defaults to empty list when an error occurs
+            - Replaces any program previously assembled into emul
+            - With a cache, unchanged files are loaded from it instead of being re-assembled
+            - Branch labels are resolved once every line is assembled, a branch to an undefined label being an error
+        """
+        emul.clear_program()
+        key: str = None
+        if self.cache is not None:
+            key = self.cache.key(self.file_nm)
+            entry = self.cache.get(key)
+            if entry is not None:
+                message, lines, type_lists, label_map, operation_log = entry
+                emul.load_program(label_map, operation_log)
+                return message, lines
+        lines: list[list[str]] = []
+        type_lists: list[list[str]] = []
+        message = str(self.check(self.encoded(emul), lines, type_lists))
+        if message == success_message:
+            try:
+                emul.resolve_targets()
+            except Exception as e:
+                message = str(e)
+        if message != success_message:
+            emul.clear_program()
+            lines, type_lists = [], []
+        if self.cache is not None:
+            self.cache.put(key, (message, lines, type_lists, dict(emul.label_map), list(emul.operation_log)))
+        return message, lines
+
+    def reassemble(self, emul, source: list[str] = None) -> str:
+        """Assembles source (the file's lines when None) into emul, keeping per-line state for update
+        Unlike start, parsing continues past syntax errors so later edits only need to re-parse what changed
+        Returns the same message as start; emul's program is cleared when the program has errors
+        """
+        if source is None:
+            source = list(self.lines())
+        self.source = list(source)
+        self.line_tokens = [tokenize(line) for line in self.source]
+        self.line_labels = [label_tokens(tokens) for tokens in self.line_tokens]
+        self.loaded = False
+        self.line_types, self.line_ops = self.parse_range(emul, self.line_tokens, self.line_labels, set(), 1)
+        return self.publish(emul)
+
+    def update(self, emul, first: int, last: int, new_lines: list[str]) -> str:
+        """Replaces source lines first to last (0-based, last exclusive) with new_lines and re-assembles incrementally
+        Only the new lines are tokenized and parsed; when the labels they define are unchanged, emul's label_map
+        and operation_log are patched in place, otherwise the whole program is re-parsed from memory
+        Returns the same message start would give for the edited program
+        """
+        if self.source is None:
+            self.reassemble(emul)
+        new_tokens: list[list[str]] = [tokenize(line) for line in new_lines]
+        new_labels: list[tuple[str, ...]] = [label_tokens(tokens) for tokens in new_tokens]
+        op_first: int = sum(map(bool, self.line_tokens[:first]))
+        op_last: int = op_first + sum(map(bool, self.line_tokens[first:last]))
+        removed: list[str] = [tokens[0] for tokens, t_types in zip(self.line_tokens[first:last], self.line_types[first:last])
+                              if t_types and t_types[0] == "label"]
+        # label_map keys keep their spelling, so renaming a label's case must rebuild them
+        labels_changed: bool = (list(chain.from_iterable(self.line_labels[first:last])) != list(chain.from_iterable(new_labels))
+                                or removed != [tokens[0] for tokens, line_labels in zip(new_tokens, new_labels) if line_labels])
+        self.source[first:last] = new_lines
+        self.line_tokens[first:last] = new_tokens
+        self.line_labels[first:last] = new_labels
+        if labels_changed:
+            # label definitions change the types of every later line, so nothing parsed before can be reused
+            self.loaded = False
+            self.line_types, self.line_ops = self.parse_range(emul, self.line_tokens, self.line_labels, set(), 1)
+            return self.publish(emul)
+        before: set[str] = set(chain.from_iterable(self.line_labels[:first]))
+        new_types, new_ops = self.parse_range(emul, new_tokens, new_labels, before, op_first+1)
+        self.line_types[first:last] = new_types
+        self.line_ops[first:last] = new_ops
+        operations: list[tuple] = []
+        labels: dict[str, int] = {}
+        for tokens, t_types, operation in zip(new_tokens, new_types, new_ops):
+            if operation is not None:
+                if t_types[0] == "label":
+                    labels[tokens[0]] = op_first + len(operations)
+                operations.append(operation)
+        return self.publish(emul, (op_first, op_last, operations, labels, removed))
+
+    def parse_range(self, emul, token_lines: list[list[str]], label_lines: list[tuple[str, ...]], labels: set[str],
+                    line_index: int) -> tuple[list[list[str]], list[tuple]]:
+        """Parses consecutive source lines given the labels defined before them, continuing past syntax errors
+        line_index is the index of the first non-empty line; returns the per-line types and skeletons
+        Every label token of a line counts as defined afterwards, even when a syntax error stopped the parser first
+        """
+        self.parser.labels = labels
+        types_list: list[list[str]] = []
+        ops: list[tuple] = []
+        for tokens, line_labels in zip(token_lines, label_lines):
+            if len(tokens) == 0:
+                types_list.append([])
+                ops.append(None)
+                continue
+            try:
+                t_types: list[str] = self.parser.parse(tokens, line_index)
+            except Exception:
+                types_list.append(None)
+                ops.append(None)
+            else:
+                types_list.append(t_types)
+                ops.append(emul.make_skel(tokens, t_types, 1 if t_types[0] == "label" else 0))
+            self.parser.labels.update(line_labels)
+            line_index += 1
+        return types_list, ops
+
+    def message(self) -> str:
+        """Returns the message start would give for the held source
+        The first syntax error is re-parsed on demand so its line number reflects the current source
+        """
+        if None in self.line_types:
+            error_line: int = self.line_types.index(None)
+            self.parser.labels = set(chain.from_iterable(self.line_labels[:error_line]))
+            try:
+                self.parser.parse(self.line_tokens[error_line], sum(map(bool, self.line_tokens[:error_line])) + 1)
+            except Exception as e:
+                return str(e)
+        line_count: int = sum(map(bool, self.line_tokens))
+        last_types: list[str] = next((t_types for t_types in reversed(self.line_types) if t_types), [])
+        if len(last_types) == 0 or last_types[-1] != "halt":
+            return f"Error: line {line_count+1} -> All programs must end with a halt instruction"
+        return success_message
+
+    def publish(self, emul, splice: tuple = None) -> str:
+        """Brings emul's program in line with the held source and returns the assembly message
+        A valid program is spliced into emul when splice is given and emul already holds the previous version,
+        otherwise it is loaded from the per-line skeletons; programs with syntax errors or branches to undefined labels
+        clear emul's program as start does
+        """
+        message: str = self.message()
+        if message == success_message:
+            try:
+                if self.loaded and splice is not None:
+                    emul.splice_program(*splice)
+                else:
+                    operation_log: list[tuple] = []
+                    label_map: dict[str, int] = {}
+                    for tokens, t_types, operation in zip(self.line_tokens, self.line_types, self.line_ops):
+                        if operation is not None:
+                            if t_types[0] == "label":
+                                label_map[tokens[0]] = len(operation_log)
+                            operation_log.append(operation)
+                    emul.load_program(label_map, operation_log)
+                    self.loaded = True
+                    emul.resolve_targets()
+            except Exception as e:
+                message = str(e)
+        if message != success_message:
+            emul.clear_program()
+            self.loaded = False
+        return message
+
+    def program_lines(self) -> list[list[str]]:
+        """Returns the token lists of the held source's non-empty lines, as the second value of start"""
+        return [tokens for tokens in self.line_tokens if len(tokens) > 0]
 
 
 def start(emul) -> tuple[str, list[list[str]]]:
     """Main entry point for Visualizer
-    returns tuple[str, list[list[str]]]
-
-        - Handles high-level parsing, tokenization and lexical analysis of file contents
-        - Files should be UTF-8 encoded
-        - Errors handled and returned as strings
-            - Second return value defaults to empty list when an error occurs
+    Thin wrapper assembling the file at the module-level file_nm with a fresh Assembler and the module cache
     """
-    grm.labels = set()
-    line_index: int = 1
-    lines: list[str] = []
-    with open(file_nm, 'r') as file:
-        line: str = file.readline()
-        while line != '':
-            tokens: list[str] = tokenize(line+" ")
-            if len(tokens) > 0:
-                t_types: list[str] = []
-                try:
-                    t_types = parse(tokens, line_index)
-                except Exception as e:
-                    grm.labels = set()
-                    return e, []
-                temp = None
-                emul.encode_skel(tokens, t_types, line_index)
-                line_index += 1
-                lines.append(tokens)
-            line = file.readline()
-        if t_types[-1] != "halt":
-            return f"Error: line {line_index} -> All programs must end with a halt instruction", []
-    return "Looks good! No syntax errors found!", lines
+    return Assembler(file_nm, cache).start(emul)
 
 
 def tokenize(line: str) -> list[str]:
@@ -50,19 +315,30 @@ def tokenize(line: str) -> list[str]:
         - Breaks tokens on spec_tokens
         - Non-ignore spec_tokens are added individually
     """
-    tokens: list[str] = []
-    long_token: str = ""
-    for char in line:
-        if char in spec_tokens:
-            if long_token != "":
-                tokens.append(long_token)
-                long_token = ""
-            if char in ignore:
-                continue
-            tokens.append(char)
-        else:
-            long_token += char
-    return tokens
+    return token_pattern.findall(line)
+
+
+def label_tokens(tokens: list[str]) -> tuple[str, ...]:
+    """Returns the tokens of a line that define labels, lower-cased as the parser stores them"""
+    return tuple(token.lower() for token in tokens if len(token) > 1 and token[-1] == ":")
+
+
+def tokenize_lines(lines: Iterator[str]) -> Iterator[list[str]]:
+    """Streams the token list of every non-empty line"""
+    for line in lines:
+        tokens: list[str] = token_pattern.findall(line)
+        if len(tokens) > 0:
+            yield tokens
+
+
+def validate() -> str:
+    """Streaming syntax check of the file at the module-level file_nm"""
+    return Assembler(file_nm).validate()
+
+
+def diagnostics() -> list[grm.ParseError]:
+    """Every syntax error of the file at the module-level file_nm, found in a single pass"""
+    return Assembler(file_nm).diagnostics()
 
 
 def parse(tokens: list[str], line_index: int) -> list[str]:
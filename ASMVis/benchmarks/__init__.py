@@ -0,0 +1,4 @@
+"""
+Benchmarks for the MiniASM parser and simulator
+Run modules from the ASMVis directory, e.g. python -m benchmarks.classifier
+"""
@@ -0,0 +1,93 @@
+import random
+from functools import partial
+import re
+import sys
+import time
+import Grammar as grm
+
+"""
+Microbenchmark comparing Grammar.get_type against the original regex/if-elif classifier
+Usage: python -m benchmarks.classifier [token_count] [seed]
+"""
+
+
+def legacy_get_type(token: str, labels: set[str]) -> str:
+    """Original classifier, kept verbatim as the benchmark baseline"""
+    if re.match(".+:$", token):
+        if token in labels:
+            raise Exception(f"Error:\nThe label \"{token}\" has already been defined elsewhere\nno two labels can have the same name")
+        labels.add(token)
+        return "label"
+    elif re.match("^r[0-9]$|^r1[0-6]$", token):
+        return "reg"
+    elif re.match("^[0-9]+$", token):
+        return "num"
+    elif token in grm.instructions:
+        return token
+    elif token in grm.arithmetic:
+        return "arithmetic"
+    elif token in grm.branches:
+        return "branch"
+    elif token in grm.address_modes:
+        return token
+    elif token + ":" in labels:
+        return "id"
+    elif token == "br":
+        return "br"
+    elif token == "skip":
+        return "skip"
+    elif token == "halt":
+        return "halt"
+    elif token == "inc":
+        return "inc"
+    else:
+        return "id"
+
+
+def make_corpus(size: int, seed: int) -> list[str]:
+    """Builds a token corpus weighted roughly like real MiniASM programs
+    Label definitions are unique so neither classifier raises on duplicates
+    """
+    rng = random.Random(seed)
+    pool = list(grm.registers) * 4 + [",", ",", ",", "=", "$", "@", "[", "]"] + list(grm.instructions) \
+        + list(grm.arithmetic) + list(grm.branches) + ["br", "inc", "skip", "halt"] \
+        + [str(n) for n in range(0, 400, 7)] + ["loop", "end", "done"]
+    corpus: list[str] = []
+    for i in range(size):
+        if i % 50 == 0:
+            corpus.append(f"label{i}:")
+        else:
+            corpus.append(rng.choice(pool))
+    return corpus
+
+
+def time_classifier(classify, corpus: list[str]) -> float:
+    """Returns the seconds taken to classify every token in corpus"""
+    start = time.perf_counter()
+    for token in corpus:
+        classify(token)
+    return time.perf_counter() - start
+
+
+def main(size: int = 1_000_000, seed: int = 131):
+    corpus = make_corpus(size, seed)
+    legacy_labels: set[str] = set()
+    grm.labels = set()
+    legacy = [legacy_get_type(token, legacy_labels) for token in corpus]
+    grm.labels = set()
+    current = [grm.get_type(token) for token in corpus]
+    if legacy != current:
+        raise Exception("Error:\nClassifiers disagree on the benchmark corpus")
+    legacy_labels = set()
+    legacy_time = time_classifier(partial(legacy_get_type, labels=legacy_labels), corpus)
+    grm.labels = set()
+    current_time = time_classifier(grm.get_type, corpus)
+    grm.labels = set()
+    print(f"tokens:  {size}")
+    print(f"legacy:  {legacy_time:.3f}s ({size / legacy_time:,.0f} tokens/s)")
+    print(f"current: {current_time:.3f}s ({size / current_time:,.0f} tokens/s)")
+    print(f"speedup: {legacy_time / current_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,67 @@
+import sys
+
+"""
+Synthetic MiniASM program generator for benchmarks
+Programs use every production in Grammar.productions (labels, every load/store/read/write addressing mode,
+all arithmetic, inc, br, every conditional branch, skip and halt) inside loops nested depth deep
+Usage: python -m benchmarks.generate <lines> [depth] [iterations] > program.asm
+"""
+
+# Registers: r1-r4 loop counters, r5-r8 loop limits, r9-r13 scratch, r14 = 1, r15 = base address, r16 = index 0
+body_block: tuple[str, ...] = (
+    "load r9, =7",
+    "load r10, r9",
+    "load r10, 40",
+    "load r10, $8",
+    "load r10, $r14",
+    "load r10, @40",
+    "load r10, [40, r16]",
+    "load r10, [r15, r16]",
+    "store r9, $r14",
+    "store r9, [100, r16]",
+    "store r9, r12",
+    "read r11, 5",
+    "read r11, r9",
+    "read r11, [5, r16]",
+    "write r9, 5",
+    "write r9, r12",
+    "write r9, [5, r16]",
+    "add r9, r14",
+    "sub r9, r14",
+    "mul r9, r14",
+    "div r9, r14",
+    "inc r13",
+    "blt r14, r14, {label}_a",
+    "{label}_a: bgt r14, r14, {label}_b",
+    "{label}_b: bleq r14, r14, {label}_c",
+    "{label}_c: bgeq r14, r14, {label}_d",
+    "{label}_d: beq r14, r14, {label}_e",
+    "{label}_e: bneq r14, r14, {label}_f",
+    "{label}_f: skip",
+)
+
+
+def generate_program(lines: int, depth: int = 1, iterations: int = 10) -> str:
+    """Returns a program of roughly lines lines whose innermost body runs iterations ** depth times
+    depth is clamped to 1-4 and the body is padded with repeated body_block copies to reach lines
+    """
+    depth = min(max(depth, 1), 4)
+    program: list[str] = ["load r13, =0", "load r14, =1", "load r15, =40", "load r16, =0"]
+    for level in range(1, depth + 1):
+        program.append(f"load r{level}, =0")
+        program.append(f"load r{level + 4}, ={iterations}")
+        program.append(f"loop{level}: bgeq r{level}, r{level + 4}, end{level}")
+    overhead = len(program) + 3 * depth + 1
+    copies = max(1, (lines - overhead) // len(body_block))
+    for copy in range(copies):
+        program.extend(line.format(label=f"b{copy}") for line in body_block)
+    for level in range(depth, 0, -1):
+        program.append(f"inc r{level}")
+        program.append(f"br loop{level}")
+        program.append(f"end{level}: skip")
+    program.append("halt")
+    return "\n".join(program) + "\n"
+
+
+if __name__ == "__main__":
+    sys.stdout.write(generate_program(*(int(arg) for arg in sys.argv[1:4])))
@@ -0,0 +1,135 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import Grammar as grm
+from Simulation import Simulation
+import Visualizer as v
+from benchmarks.generate import generate_program
+
+"""
+Parser and simulator throughput benchmark
+Generates synthetic programs of increasing size and loop depth and measures
+    - Visualizer.tokenize, Grammar hash_parse and Simulation.encode_skel in lines per second
+    - simulate_step and Simulation.run in steps per second
+    - peak traced memory of each phase
+Results are written as JSON so runs can be compared between releases
+Usage: python -m benchmarks.throughput [--output results.json] [--quick]
+"""
+
+# (lines, loop depth, iterations per loop)
+default_sizes: tuple[tuple[int, int, int], ...] = ((100, 1, 1000), (1000, 2, 30), (10000, 2, 10), (2000, 3, 12))
+quick_sizes: tuple[tuple[int, int, int], ...] = ((100, 1, 100), (1000, 2, 5))
+step_limit: int = 1000000
+
+
+def measure(function, *args, setup=None) -> tuple[float, int, object]:
+    """Returns wall seconds, peak traced bytes and the result of function(*args)
+    Timing and memory are taken in separate calls so tracing does not skew the timing
+    With setup, each call gets a fresh setup() result as its first argument, built outside the timed and traced region
+    """
+    prepared = (setup(),) if setup is not None else ()
+    start = time.perf_counter()
+    result = function(*prepared, *args)
+    seconds = time.perf_counter() - start
+    prepared = (setup(),) if setup is not None else ()
+    tracemalloc.start()
+    function(*prepared, *args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, result
+
+
+def tokenize_all(lines: list[str]) -> list[list[str]]:
+    return [tokens for tokens in (v.tokenize(line) for line in lines) if len(tokens) > 0]
+
+
+def parse_all(token_sets: list[list[str]]) -> list[list[str]]:
+    parser = grm.Parser()
+    return [parser.parse(tokens, line_index) for line_index, tokens in enumerate(token_sets, 1)]
+
+
+def encode_all(token_sets: list[list[str]], type_lists: list[list[str]]) -> Simulation:
+    emul = Simulation(numeric=True)
+    for line_index, (tokens, t_types) in enumerate(zip(token_sets, type_lists), 1):
+        emul.encode_skel(tokens, t_types, line_index)
+    return emul
+
+
+def assembled(path: str) -> Simulation:
+    """Assembles and compiles a program into a fresh Simulation, so the simulator phases only time simulation"""
+    emul = Simulation(numeric=True)
+    v.Assembler(path).start(emul)
+    emul.compile()
+    return emul
+
+
+def step_all(emul: Simulation) -> int:
+    """Runs an assembled program one simulate_step call at a time, as the visualizer does"""
+    emul.record_undo = False
+    index: int = 0
+    steps: int = 0
+    while steps < step_limit:
+        halt = emul.operation_log[index][0] == "halt"
+        index = emul.simulate_step(index)
+        steps += 1
+        if halt:
+            break
+    return steps
+
+
+def run_all(emul: Simulation) -> int:
+    return emul.run(max_steps=step_limit)[0]
+
+
+def bench_size(lines: int, depth: int, iterations: int) -> dict:
+    """Benchmarks every phase on one generated program"""
+    source = generate_program(lines, depth, iterations)
+    raw_lines = source.splitlines(keepends=True)
+    with tempfile.NamedTemporaryFile("w", suffix=".asm", delete=False) as file:
+        file.write(source)
+        path = file.name
+    try:
+        result = {"lines": len(raw_lines), "depth": depth, "iterations": iterations, "bytes": len(source)}
+        seconds, peak, token_sets = measure(tokenize_all, raw_lines)
+        result["tokenize"] = {"seconds": seconds, "lines_per_second": len(raw_lines) / seconds, "peak_bytes": peak}
+        seconds, peak, type_lists = measure(parse_all, token_sets)
+        result["parse"] = {"seconds": seconds, "lines_per_second": len(token_sets) / seconds, "peak_bytes": peak}
+        seconds, peak, _ = measure(encode_all, token_sets, type_lists)
+        result["encode"] = {"seconds": seconds, "lines_per_second": len(token_sets) / seconds, "peak_bytes": peak}
+        seconds, peak, steps = measure(step_all, setup=lambda: assembled(path))
+        result["simulate_step"] = {"seconds": seconds, "steps": steps, "steps_per_second": steps / seconds, "peak_bytes": peak}
+        seconds, peak, steps = measure(run_all, setup=lambda: assembled(path))
+        result["run"] = {"seconds": seconds, "steps": steps, "steps_per_second": steps / seconds, "peak_bytes": peak}
+    finally:
+        os.remove(path)
+    return result
+
+
+def main(argv: list[str] = None) -> int:
+    arg_parser = argparse.ArgumentParser(prog="python -m benchmarks.throughput", description="MiniASM parser and simulator throughput")
+    arg_parser.add_argument("--output", default=None, help="write JSON results to this file instead of stdout")
+    arg_parser.add_argument("--quick", action="store_true", help="only run the small sizes")
+    args = arg_parser.parse_args(argv)
+    report = {
+        "grammar_version": grm.grammar_version,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": [bench_size(*size) for size in (quick_sizes if args.quick else default_sizes)]
+    }
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, 'w') as file:
+            file.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,16 @@
+import os
+import sys
+import pytest
+
+# the ASMVis modules import each other by bare name, as when run from the ASMVis directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def write_program(tmp_path):
+    """Writes MiniASM source lines to a file under tmp_path and returns its path"""
+    def write(lines: list[str], name: str = "program.asm") -> str:
+        path = tmp_path / name
+        path.write_text("\n".join(lines))
+        return str(path)
+    return write
@@ -0,0 +1,32 @@
+import pytest
+import Visualizer as v
+from CostModel import CostModel
+from Simulation import Simulation
+
+load_forms = ["load r1, 8", "load r1, $8", "load r1, $r4", "load r1, @8", "load r1, @r2", "load r1, [8, r4]", "load r1, [r2, r4]"]
+
+
+def step_costs(write_program, model: CostModel) -> dict[str, int]:
+    emul = Simulation(numeric=True)
+    assert v.Assembler(write_program(load_forms + ["halt"])).start(emul)[0] == v.success_message
+    return {line: model.step_costs[op.mode][op.opcode] for line, op in zip(load_forms, emul.compile())}
+
+
+def test_penalties_follow_addressing_mode(write_program):
+    model = CostModel(indexed_penalty=100, indirect_penalty=1000)
+    costs = step_costs(write_program, model)
+    direct = costs["load r1, 8"]
+    # relative and index operands pay the indexed penalty whether they are folded into a constant address or not
+    assert costs["load r1, $8"] == costs["load r1, $r4"] == direct + 100
+    assert costs["load r1, [8, r4]"] == costs["load r1, [r2, r4]"] == direct + 100
+    # both indirect forms pay the indirect penalty, and a pointer read from memory is one more word on the bus
+    assert costs["load r1, @r2"] == direct + 1000
+    assert costs["load r1, @8"] == direct + 1000 + model.memory_penalty
+
+
+def test_cycles_name_instructions_and_opcodes(write_program):
+    costs = step_costs(write_program, CostModel({"load": 7, "load_indirect": 50}, indexed_penalty=0, indirect_penalty=0, memory_penalty=0))
+    assert costs["load r1, 8"] == costs["load r1, $r4"] == costs["load r1, @r2"] == 7
+    assert costs["load r1, @8"] == 50
+    with pytest.raises(Exception, match="is not a MiniASM instruction or opcode"):
+        CostModel({"lod": 3})
@@ -0,0 +1,45 @@
+import random
+import Visualizer as v
+from Simulation import Simulation
+from benchmarks.generate import generate_program, body_block
+
+# replacement lines: blank lines, label definitions and redefinitions, branches to new and missing labels, syntax errors
+edit_lines = ["", "   ", "halt", "skip", "br loop1", "b0_a: skip", "new: halt", "inc r1", "load r1, =", "Loop1: skip",
+              "halt: skip", "br halt", "x:", "b0_c: inc r2"] + [line.format(label="b0") for line in body_block]
+
+
+def edit_program(write_program, rng: random.Random, edits: int) -> int:
+    """Applies random edits to a generated program through Assembler.update, checking every version against a fresh
+    assembly of the edited file; returns how many edits were spliced into an already loaded program
+    """
+    source = generate_program(rng.choice([40, 80]), rng.randint(1, 2), 3).splitlines()
+    for count in range(rng.randint(0, 5)):
+        source.insert(rng.randrange(len(source)), "")
+    assembler = v.Assembler(write_program(source))
+    emul = Simulation(numeric=True)
+    assembler.reassemble(emul, [line + "\n" for line in source])
+    spliced = 0
+    for edit in range(edits):
+        first = rng.randrange(len(source) + 1)
+        last = min(len(source), first + rng.randint(0, 3))
+        new_lines = [rng.choice(edit_lines + source) for count in range(rng.randint(0, 3))]
+        loaded = assembler.loaded
+        message = assembler.update(emul, first, last, [line + "\n" for line in new_lines])
+        source[first:last] = new_lines
+        reference = Simulation(numeric=True)
+        reference_message, reference_lines = v.Assembler(write_program(source)).start(reference)
+        assert message == reference_message
+        assert dict(emul.label_map) == dict(reference.label_map)
+        assert emul.operation_log == reference.operation_log
+        if message == v.success_message:
+            assert assembler.program_lines() == reference_lines
+            assert emul.resolve_targets() == reference.resolve_targets()
+            spliced += loaded and assembler.loaded
+    return spliced
+
+
+def test_update_matches_fresh_assembly(write_program):
+    rng = random.Random(1)
+    spliced = sum(edit_program(write_program, rng, 40) for program in range(30))
+    # some edits must have taken the in-place splice path rather than a full re-parse
+    assert spliced > 0
@@ -0,0 +1,36 @@
+import pytest
+import Visualizer as v
+from Simulation import Simulation
+
+# labels are case-insensitive: "done" branches to "Done:"
+mixed_case = [
+    "load r1, =1",
+    "load r2, =5",
+    "Loop: bgt r1, r2, done",
+    "inc r1",
+    "br LOOP",
+    "Done: halt"
+]
+
+
+@pytest.mark.parametrize("numeric", [True, False])
+def test_mixed_case_labels_resolve(write_program, numeric):
+    emul = Simulation(numeric=numeric)
+    assert v.Assembler(write_program(mixed_case)).start(emul)[0] == v.success_message
+    emul.run()
+    assert emul.halted
+    assert emul.curr_line == len(mixed_case) - 1
+    registers = emul.registers if numeric else [int(emul.history["registers"][f"r{number}"] or 0) for number in range(3)]
+    assert registers[1] == 6
+
+
+def test_mixed_case_labels_validate(write_program):
+    assert v.Assembler(write_program(mixed_case)).validate() == v.success_message
+    assert v.Assembler(write_program(mixed_case)).diagnostics() == []
+
+
+def test_undefined_label_reported(write_program):
+    path = write_program(mixed_case[:-1] + ["Finish: halt"])
+    errors = v.Assembler(path).diagnostics()
+    assert len(errors) == 1
+    assert errors[0].line == 3
@@ -0,0 +1,48 @@
+import json
+import os
+import re
+import Grammar as grm
+import Visualizer as v
+
+# lines parsed by the original module-level parser, in file order, with its token types or error message
+# generated from benchmark lines, mutations and truncations of them, and random token runs
+baseline_path = os.path.join(os.path.dirname(__file__), "data", "parser_baseline.json")
+
+
+def normalized(message: str) -> str:
+    """Sorts the expected symbols of a message, as both parsers print them as a set in hash order"""
+    return re.sub(r"\{([^}]*)\}", lambda match: "{" + ", ".join(sorted(match.group(1).split(", "))) + "}", message)
+
+
+def test_parser_matches_baseline():
+    with open(baseline_path, 'r') as file:
+        cases = json.load(file)
+    parser = grm.Parser()
+    for line_index, line, outcome, expected in cases:
+        try:
+            result = ("ok", parser.parse(v.tokenize(line), line_index))
+        except Exception as e:
+            result = ("error", normalized(str(e)))
+        if outcome == "error":
+            expected = normalized(expected)
+        assert result == (outcome, expected), line
+
+
+def test_tokenize_matches_character_scan():
+    # the regular expression tokenizer splits lines exactly like the original character loop
+    with open(baseline_path, 'r') as file:
+        lines = [case[1] for case in json.load(file)]
+    for line in lines + ["load r1,=5\n", "\tstore r2 ,[ 4,r3 ]", "br  done ", ""]:
+        tokens, token = [], ""
+        for char in line:
+            if char in v.spec_tokens:
+                if token != "":
+                    tokens.append(token)
+                    token = ""
+                if char not in v.ignore:
+                    tokens.append(char)
+            else:
+                token += char
+        if token != "":
+            tokens.append(token)
+        assert v.tokenize(line) == tokens, line
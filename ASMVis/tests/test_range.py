@@ -0,0 +1,46 @@
+import pytest
+import Visualizer as v
+from Simulation import Simulation
+
+register_max = 2 ** 63 - 1
+
+# each program leaves a value a signed 64-bit register cannot hold on its failing line
+overflows = [
+    (["load r1, 8", "inc r1", "halt"], 2),
+    (["load r1, =9223372036854775808", "halt"], 1),
+    (["load r1, 8", "load r2, =2", "mul r1, r2", "halt"], 3),
+    (["load r1, =0", "load r2, 8", "sub r1, r2", "load r2, =2", "sub r1, r2", "halt"], 5)
+]
+
+
+def assembled(path: str, numeric: bool) -> Simulation:
+    emul = Simulation(numeric=numeric)
+    emul.set_base("memory", "8", str(register_max))
+    assert v.Assembler(path).start(emul)[0] == v.success_message
+    return emul
+
+
+@pytest.mark.parametrize("numeric", [True, False])
+@pytest.mark.parametrize("lines, line", overflows)
+def test_run_rejects_out_of_range(write_program, numeric, lines, line):
+    emul = assembled(write_program(lines), numeric)
+    with pytest.raises(Exception, match=f"Line {line} -> value out of 64-bit range"):
+        emul.run()
+
+
+@pytest.mark.parametrize("numeric", [True, False])
+@pytest.mark.parametrize("lines, line", overflows)
+def test_step_rejects_out_of_range(write_program, numeric, lines, line):
+    emul = assembled(write_program(lines), numeric)
+    index = 0
+    with pytest.raises(Exception, match=f"Line {line} -> value out of 64-bit range"):
+        while index < len(lines):
+            index = emul.simulate_step(index)
+
+
+@pytest.mark.parametrize("numeric", [True, False])
+def test_range_limits_hold(write_program, numeric):
+    emul = assembled(write_program(["load r1, 8", "load r2, =0", "sub r2, r1", "load r3, =1", "sub r2, r3", "halt"]), numeric)
+    emul.run()
+    assert emul.halted
+    assert int(emul.display_state("registers")["r2"] if numeric else emul.history["registers"]["r2"]) == -register_max - 1
@@ -0,0 +1,53 @@
+import random
+import pytest
+import Instructions as ins
+import Visualizer as v
+from Simulation import Simulation
+from benchmarks.generate import generate_program
+
+
+def assembled(path: str) -> Simulation:
+    emul = Simulation(numeric=True)
+    emul.set_base("memory", "40", "3")
+    emul.set_base("disk", "5", "2")
+    assert v.Assembler(path).start(emul)[0] == v.success_message
+    emul.compile()
+    return emul
+
+
+def snapshot(emul: Simulation, pc: int) -> tuple:
+    return pc, list(emul.registers), dict(emul.memory), dict(emul.disk)
+
+
+def stepped_states(path: str) -> list[tuple]:
+    """State after every step of a plain forward run, without a timeline, up to the halt"""
+    emul = assembled(path)
+    states = [snapshot(emul, 0)]
+    index, halted = 0, False
+    while not halted:
+        op = emul.program[index]
+        next_index = emul.simulate_step(index)
+        halted = op.opcode == ins.opcodes["halt"] or next_index >= len(emul.program)
+        index = next_index
+        states.append(snapshot(emul, index))
+    return states
+
+
+@pytest.mark.parametrize("interval", [1, 16, 256])
+def test_seek_matches_forward_run(write_program, interval):
+    path = write_program(generate_program(60, 2, 4).splitlines())
+    states = stepped_states(path)
+    emul = assembled(path)
+    emul.enable_timeline(interval)
+    rng = random.Random(interval)
+    last = len(states) - 1
+    # long jumps both ways, short steps back within a segment, and seeks past the halt
+    targets = [rng.randrange(last + 1) for count in range(60)] + [last, 0, last + 50]
+    for count in range(40):
+        targets.append(max(0, targets[-1] - rng.randint(1, 5)))
+        targets.append(min(last, targets[-1] + rng.randint(1, 5)))
+    for step in targets:
+        pc = emul.seek(step)
+        expected = min(step, last)
+        assert emul.timeline.step == expected
+        assert snapshot(emul, pc) == states[expected]